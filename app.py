@@ -1,17 +1,31 @@
 import cv2
+import math
 import time
+import json
 import threading
 import logging
 import numpy as np
 from flask import Flask, render_template, Response, jsonify, request
 from sleep_manager import get_sleep_manager
 
+# libjpeg-turbo's SIMD encoder is optional; fall back to cv2.imencode without it
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+# nvJPEG (nvjpeg-python) can move the encode onto an NVIDIA GPU, e.g. on a Jetson
+try:
+    from nvjpeg import NvJpeg
+except ImportError:
+    NvJpeg = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
     handlers=[
-        logging.FileHandler('baby_sleep.log'),
+        logging.FileHandler('baby_sleep.log', delay=True),  # Created on the first record
         logging.StreamHandler()
     ]
 )
@@ -30,41 +44,101 @@ werkzeug_logger.addFilter(StatusFilter())
 
 app = Flask(__name__)
 
+def _has_cuda_device():
+    """Check whether OpenCV sees a CUDA device (False on non-CUDA builds)."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+def _encode_cv2(frame, quality):
+    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                             cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+    return jpeg.tobytes()
+
+# Pick the stream encoder once: nvJPEG on a CUDA GPU, then libjpeg-turbo,
+# then cv2.imencode
+_encode_fn = _encode_cv2
+if NvJpeg is not None and _has_cuda_device():
+    try:
+        _nvjpeg = NvJpeg()
+        _encode_fn = lambda frame, quality: _nvjpeg.encode(frame, quality)
+        print("Using nvJPEG for stream encoding.")
+    except Exception as e:
+        print(f"nvJPEG unavailable ({e}).")
+if _encode_fn is _encode_cv2 and TurboJPEG is not None:
+    try:
+        _turbo_jpeg = TurboJPEG()
+        _encode_fn = lambda frame, quality: _turbo_jpeg.encode(
+            frame, quality=quality, jpeg_subsample=TJSAMP_420)
+        print("Using TurboJPEG for stream encoding.")
+    except Exception as e:
+        print(f"TurboJPEG unavailable ({e}), using cv2.imencode.")
+
+def encode_jpeg(frame, quality):
+    """Encode a BGR frame as JPEG bytes (shared by the real and mock cameras)."""
+    return _encode_fn(frame, quality)
+
 class MockCamera(object):
     """Simulates a camera feed for testing when no physical camera is available."""
     ALARM_TIMEOUT_SECONDS = 10  # Same as VideoCamera
+    JPEG_QUALITY = 70  # Same as VideoCamera
+    LUT_SIZE = 628  # Frames before the simulated motion repeats
     
     def __init__(self):
         self.motion_detected = False
         self.motion_score = 0
         self.frame_count = 0
+        self.jpeg_quality = self.JPEG_QUALITY
+        self.motion_every = 1  # Accepted for API compatibility, not used
         self.last_motion_time = time.time()
+        
+        # The banner never changes: render it once and only redraw the circle per frame
+        self._bg = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(self._bg, "SIMULATION MODE - NO CAMERA DETECTED", (50, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        self._img = self._bg.copy()
+        self._dirty = None  # (y0, y1, x0, x1) of the circle drawn on _img
+        # Stream clients share _img: restore, draw and encode under one lock
+        self._draw_lock = threading.RLock()
+        
+        # sin/cos of frame_count * 0.1 (628 steps cover 10 periods almost exactly),
+        # kept as plain Python floats so the per-frame math skips NumPy scalars
+        self._sin_lut = [math.sin(i * 0.1) for i in range(self.LUT_SIZE)]
+        self._cos_lut = [math.cos(i * 0.1) for i in range(self.LUT_SIZE)]
         print("Initializing Mock Camera (Simulation Mode)...")
 
     def get_frame(self):
-        # Create a dynamic image
-        self.frame_count += 1
-        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        with self._draw_lock:
+            # Create a dynamic image
+            self.frame_count += 1
+            img = self._img
         
-        # Draw a moving circle to simulate "motion" occasionally
-        cx = int(320 + 100 * np.sin(self.frame_count * 0.1))
-        cy = int(240 + 50 * np.cos(self.frame_count * 0.1))
+            # Only the previous circle's bounding box needs restoring
+            if self._dirty is not None:
+                y0, y1, x0, x1 = self._dirty
+                img[y0:y1, x0:x1] = self._bg[y0:y1, x0:x1]
         
-        cv2.circle(img, (cx, cy), 40, (255, 255, 0), -1)
-        cv2.putText(img, "SIMULATION MODE - NO CAMERA DETECTED", (50, 50), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            # Draw a moving circle to simulate "motion" occasionally
+            i = self.frame_count % self.LUT_SIZE
+            s = self._sin_lut[i]
+            cx = int(320 + 100 * s)
+            cy = int(240 + 50 * self._cos_lut[i])
         
-        # Simulate motion detection logic
-        # In a real scenario, this would be calculated. Here we just fake it based on movement.
-        self.motion_score = 8000 * abs(np.sin(self.frame_count * 0.1))
-        self.motion_detected = self.motion_score > 5000
+            # The circle stays well below the banner, so drawing it last is safe
+            cv2.circle(img, (cx, cy), 40, (255, 255, 0), -1)
+            self._dirty = (cy - 41, cy + 42, cx - 41, cx + 42)
         
-        # Update last_motion_time if motion is detected
-        if self.motion_detected:
-            self.last_motion_time = time.time()
+            # Simulate motion detection logic
+            # In a real scenario, this would be calculated. Here we just fake it based on movement.
+            self.motion_score = 8000 * abs(s)
+            self.motion_detected = self.motion_score > 5000
+        
+            # Update last_motion_time if motion is detected
+            if self.motion_detected:
+                self.last_motion_time = time.time()
         
-        ret, jpeg = cv2.imencode('.jpg', img)
-        return jpeg.tobytes()
+            return encode_jpeg(img, self.jpeg_quality)
     
     def is_alarm_active(self):
         """Check if alarm should be active (no motion for ALARM_TIMEOUT_SECONDS)."""
@@ -73,10 +147,22 @@ class MockCamera(object):
     def get_seconds_since_motion(self):
         """Get the number of seconds since last motion was detected."""
         return int(time.time() - self.last_motion_time)
+    
+    def wait_for_frame(self, last_frame_id=None, timeout=None):
+        """Frames are generated on demand: render the next one right away."""
+        with self._draw_lock:
+            frame = self.get_frame()
+            return self.frame_count, frame
 
 class VideoCamera(object):
     ALARM_TIMEOUT_SECONDS = 10  # Trigger alarm after 10 seconds of no motion
     PROCESSING_FPS = 5  # Process motion detection at 5 FPS in background
+    JPEG_QUALITY = 70  # Default quality of the shared MJPEG stream frames
+    MOTION_SIZE = (320, 240)  # Motion detection runs on frames downscaled to this (w, h)
+    USE_OPENCL = False  # Run motion detection through OpenCV's OpenCL T-API (cv2.UMat)
+    MOTION_EVERY = 1  # Run motion detection (and feed the sleep manager) on every Nth processed frame
+    CAPTURE_SIZE = (640, 480)  # Resolution requested from the camera
+    CAPTURE_FPS = 30  # Frame rate requested from the camera
     
     def __init__(self):
         self.video = None
@@ -91,14 +177,50 @@ class VideoCamera(object):
         self.zoom_level = 1.0  # 1.0 = no zoom, 2.0 = 2x zoom, etc.
         self.contrast_level = 1.0  # 1.0 = no enhancement, higher = more CLAHE
         self.brightness_level = 0  # -50 to +50 adjustment
-        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self.jpeg_quality = self.JPEG_QUALITY  # 30 to 95, stream quality vs bandwidth
+        self.motion_every = self.MOTION_EVERY  # 1 to 10, detect motion every Nth frame
+        self._frame_idx = 0
+        
+        # Offload motion detection to the GPU when enabled and OpenCL works here
+        self._use_opencl = self.USE_OPENCL and cv2.ocl.haveOpenCL()
+        if self._use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+            print("Using OpenCL for motion detection.")
+        self._clahe_cache = {}  # contrast_level -> display CLAHE object
+        
+        self._zoom_out_buf = None  # Reused output buffer for digital zoom
+        self._ycrcb_buf = None  # Reused buffers for display enhancements
+        self._y_buf = None
+        self._bgr_out_buf = None
         
         # Background processing state
         self._running = False
         self._processing_thread = None
-        self._latest_raw_frame = None  # Latest raw frame for display
+        self._grab_thread = None
+        self._latest_raw_frame = None  # Latest captured frame (never mutated)
+        self._last_processed_frame = None  # Frame the last motion tick ran on
         self._frame_lock = threading.Lock()
-        self._motion_boxes = []  # Bounding boxes of detected motion areas
+        self._label_cache = {}  # (text, scale, color, thickness) -> blendable label bitmap
+        self._draw_scratch = None  # Reused buffer that display overlays are drawn on
+        self._latest_jpeg = None  # Encoded display frame shared by all stream clients
+        self._composed_frame = None  # Raw frame behind _latest_jpeg
+        self._composed_state = None  # Overlay/enhancement state behind _latest_jpeg
+        self._frame_cond = threading.Condition()  # Notified when _latest_jpeg changes
+        self._frame_id = 0  # Incremented for every published frame
+        self._motion_boxes = ()  # Bounding boxes of detected motion areas (replaced, never mutated)
+        self._motion_box_id = 0  # Incremented whenever _motion_boxes changes
+        
+        # Scratch buffers for motion detection, sized on the first processed frame
+        self._delta_buf = None
+        self._thresh_buf = None
+        self._dilate_buf = None
+        self._labels_buf = None
+        self._small_buf = None  # Downscaled frame and its grayscale version
+        self._gray_buf = None
+        self._blur_bufs = None  # Ping-pong output buffers for process_frame
+        self._blur_idx = 0
+        self._roi_pixel = None  # Cached (roi, w, h) -> pixel ROI for display
+        self._roi_pixel_key = None
         
         try:
             with open("camera_debug.log", "w") as f:
@@ -115,6 +237,8 @@ class VideoCamera(object):
                 with open("camera_debug.log", "a") as f: f.write(msg + "\n")
                 self.video = None
             else:
+                self._configure_capture()
+                
                 # Try reading one frame to ensure it actually works
                 ret, frame = self.video.read()
                 if not ret:
@@ -125,7 +249,8 @@ class VideoCamera(object):
                     self.video = None
                 else:
                     self.last_frame = self.process_frame(frame)
-                    self._latest_raw_frame = frame.copy()
+                    self._latest_raw_frame = frame
+                    self._last_processed_frame = frame
                     msg = "Camera initialized successfully!"
                     print(msg)
                     with open("camera_debug.log", "a") as f: f.write(msg + "\n")
@@ -147,31 +272,31 @@ class VideoCamera(object):
         # We need to ensure logic flow handles failures without crashing.
     
     def _start_background_processing(self):
-        """Start the background thread for continuous motion detection."""
+        """Start the capture and motion detection background threads."""
         if self._running:
             return
         self._running = True
+        self._grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._grab_thread.start()
         self._processing_thread = threading.Thread(target=self._background_loop, daemon=True)
         self._processing_thread.start()
         print("Background motion detection thread started.")
     
     def _stop_background_processing(self):
-        """Stop the background processing thread."""
+        """Stop the background threads."""
         self._running = False
-        if self._processing_thread and self._processing_thread.is_alive():
-            self._processing_thread.join(timeout=2.0)
+        for thread in (self._grab_thread, self._processing_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=2.0)
         print("Background motion detection thread stopped.")
     
-    def _background_loop(self):
+    def _grab_loop(self):
         """
-        Continuous loop that captures frames and processes motion detection.
-        This runs independently of whether any client is viewing the stream.
+        Continuously read frames from the camera as fast as it delivers them.
+        Only the latest frame is kept, so the driver's buffer never backs up
+        when motion processing is slower than the camera.
         """
-        frame_interval = 1.0 / self.PROCESSING_FPS
-        
         while self._running:
-            start_time = time.time()
-            
             try:
                 with self.lock:
                     if not self.video or not self.video.isOpened():
@@ -179,16 +304,53 @@ class VideoCamera(object):
                     ret, frame = self.video.read()
                 
                 if ret and frame is not None:
-                    # Store raw frame for display
+                    # read() hands us a fresh buffer every call, so swapping
+                    # the reference is enough to publish it.
                     with self._frame_lock:
-                        self._latest_raw_frame = frame.copy()
+                        self._latest_raw_frame = frame
+                else:
+                    time.sleep(0.01)  # Don't spin on a failing camera
+            except Exception as e:
+                print(f"Error capturing frame: {e}")
+                time.sleep(0.1)
+    
+    def _background_loop(self):
+        """
+        Continuous loop that processes motion detection on the latest frame.
+        This runs independently of whether any client is viewing the stream.
+        """
+        frame_interval = 1.0 / self.PROCESSING_FPS
+        
+        while self._running:
+            start_time = time.time()
+            
+            try:
+                with self._frame_lock:
+                    frame = self._latest_raw_frame
+                
+                # Skip the tick if the camera hasn't delivered a new frame;
+                # diffing a frame against itself would read as "no motion"
+                if frame is not None and frame is not self._last_processed_frame:
+                    self._last_processed_frame = frame
                     
-                    # Process for motion detection
-                    self._process_motion(frame)
+                    # Process for motion detection (on every Nth frame; in
+                    # between, the last motion state is kept for display)
+                    self._frame_idx += 1
+                    phase = self._frame_idx % self.motion_every
+                    if phase == 0:
+                        self._process_motion(frame)
+                        
+                        # Update sleep manager with current motion score
+                        sleep_mgr = get_sleep_manager()
+                        sleep_mgr.update(self.motion_score)
+                    elif phase == self.motion_every - 1:
+                        # Keep diffing adjacent frames, which the sleep
+                        # thresholds are tuned on: a diff across N frames
+                        # would add up N frames of motion
+                        self.last_frame = self.process_frame(frame)
                     
-                    # Update sleep manager with current motion score
-                    sleep_mgr = get_sleep_manager()
-                    sleep_mgr.update(self.motion_score)
+                    # Render and encode the display frame once for all clients
+                    self._compose_display_frame(frame)
                     
             except Exception as e:
                 print(f"Error in background processing: {e}")
@@ -200,42 +362,63 @@ class VideoCamera(object):
     
     def _process_motion(self, frame):
         """Process a frame for motion detection (updates motion state)."""
-        h, w = frame.shape[:2]
+        frame_h, frame_w = frame.shape[:2]
         current_gray = self.process_frame(frame)
+        w, h = self._motion_size(frame)
+        scale_x = frame_w / w
+        scale_y = frame_h / h
         
         if self.last_frame is None:
             self.last_frame = current_gray
             return
         
+        if self._delta_buf is None or self._delta_buf.shape != (h, w):
+            self._allocate_motion_buffers((h, w))
+        # OpenCL works on UMats it allocates itself, so only reuse buffers on the CPU
+        if self._use_opencl:
+            delta_buf = thresh_buf = dilate_buf = None
+        else:
+            delta_buf, thresh_buf, dilate_buf = self._delta_buf, self._thresh_buf, self._dilate_buf
+        
         # Compute difference
-        frame_delta = cv2.absdiff(self.last_frame, current_gray)
+        delta = cv2.absdiff(self.last_frame, current_gray, dst=delta_buf)
         # Tune sensitivity for breathing detection
-        thresh = cv2.threshold(frame_delta, 5, 255, cv2.THRESH_BINARY)[1]
-        thresh = cv2.dilate(thresh, None, iterations=2)
-        
-        # Apply ROI mask if set
-        if self.roi is not None:
-            rx, ry, rw, rh = self.roi
-            roi_x = int(rx * w)
-            roi_y = int(ry * h)
-            roi_w = int(rw * w)
-            roi_h = int(rh * h)
-            
-            mask = np.zeros(thresh.shape, dtype=np.uint8)
-            mask[roi_y:roi_y+roi_h, roi_x:roi_x+roi_w] = 255
-            thresh = cv2.bitwise_and(thresh, mask)
+        _, thresh = cv2.threshold(delta, 5, 255, cv2.THRESH_BINARY, dst=thresh_buf)
+        
+        # Nothing changed at all: skip dilate, ROI masking and contour search
+        if cv2.countNonZero(thresh) == 0:
+            self._set_no_motion(current_gray)
+            return
+        
+        thresh = cv2.dilate(thresh, None, dst=dilate_buf, iterations=2)
+        if self._use_opencl:
+            thresh = thresh.get()  # The remaining steps work on (sliced) numpy arrays
         
-        # Calculate motion score (sum of white pixels)
-        self.motion_score = np.sum(thresh)
+        # Only count motion inside the ROI, if set (a view, no masking pass)
+        roi = self.roi
+        if roi is not None:
+            roi_x, roi_y, roi_w, roi_h = self._roi_to_pixels(roi, w, h)
+            region = thresh[roi_y:roi_y+roi_h, roi_x:roi_x+roi_w]
+            labels = self._labels_buf[roi_y:roi_y+roi_h, roi_x:roi_x+roi_w]
+        else:
+            roi_x = roi_y = 0
+            region = thresh
+            labels = self._labels_buf
+        
+        # Calculate motion score (sum of white pixels), scaled back to
+        # full-resolution units so the sleep manager thresholds still apply.
+        # The mask only holds 0/255, so counting set pixels gives the same sum.
+        self.motion_score = cv2.countNonZero(region) * 255 * scale_x * scale_y
         self.motion_detected = self.motion_score > 500
         
-        # Find contours and save bounding boxes for display
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        boxes = []
-        for contour in contours:
-            if cv2.contourArea(contour) > 100:  # Filter small noise
-                boxes.append(cv2.boundingRect(contour))
-        self._motion_boxes = boxes
+        # Find connected motion blobs in the ROI and save bounding boxes
+        # (offset back to the full frame, in display coordinates)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(region, labels=labels, connectivity=8)
+        stats = stats[1:]  # Label 0 is the background
+        min_area = 100 / (scale_x * scale_y)  # Filter small noise
+        rects = stats[stats[:, cv2.CC_STAT_AREA] > min_area, :4] + (roi_x, roi_y, 0, 0)
+        rects = rects * (scale_x, scale_y, scale_x, scale_y)
+        self._set_motion_boxes(tuple(tuple(r) for r in rects.astype(int).tolist()))
         
         # Update last_motion_time if motion is detected
         if self.motion_detected:
@@ -244,30 +427,116 @@ class VideoCamera(object):
         # Update last frame
         self.last_frame = current_gray
     
+    def _set_no_motion(self, current_gray):
+        """Record a motion tick in which no pixel changed."""
+        self.motion_score = 0
+        self.motion_detected = False
+        self._set_motion_boxes(())
+        self.last_frame = current_gray
+    
+    def _set_motion_boxes(self, boxes):
+        """Publish a new tuple of motion boxes, bumping the id only if they changed."""
+        if boxes != self._motion_boxes:
+            self._motion_boxes = boxes
+            self._motion_box_id += 1
+    
+    def _allocate_motion_buffers(self, shape):
+        """(Re)allocate the motion detection scratch buffers for a frame shape."""
+        self._delta_buf = np.empty(shape, dtype=np.uint8)
+        self._thresh_buf = np.empty(shape, dtype=np.uint8)
+        self._dilate_buf = np.empty(shape, dtype=np.uint8)
+        self._labels_buf = np.empty(shape, dtype=np.int32)
+    
+    @staticmethod
+    def _roi_to_pixels(roi, w, h):
+        """Convert a normalized ROI to pixel coordinates for a w x h frame."""
+        rx, ry, rw, rh = roi
+        return (int(rx * w), int(ry * h), int(rw * w), int(rh * h))
+    
+    def _get_roi_pixel(self, w, h):
+        """Get the pixel ROI for the display frame, recomputed only when it changes."""
+        roi = self.roi
+        key = (roi, w, h)
+        if key != self._roi_pixel_key:
+            self._roi_pixel = self._roi_to_pixels(roi, w, h) if roi is not None else None
+            self._roi_pixel_key = key
+        return self._roi_pixel
+    
+    def _configure_capture(self):
+        """
+        Ask the camera for MJPG frames at CAPTURE_SIZE/CAPTURE_FPS with a
+        one-frame driver buffer. Cameras ignore settings they don't support.
+        """
+        # Compressed MJPG is cheaper to ingest than raw YUY2 and allows
+        # higher frame rates over USB; the FOURCC must be set before the size
+        self.video.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.video.set(cv2.CAP_PROP_FRAME_WIDTH, self.CAPTURE_SIZE[0])
+        self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, self.CAPTURE_SIZE[1])
+        self.video.set(cv2.CAP_PROP_FPS, self.CAPTURE_FPS)
+        # Don't let stale frames queue up in the driver
+        self.video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    
     def is_working(self):
         return self.video is not None and self.video.isOpened()
 
     def apply_enhancements(self, frame):
         """Apply contrast, brightness and CLAHE enhancements for display."""
-        if self.contrast_level > 1.0 or self.brightness_level != 0:
-            # Convert to LAB color space for better contrast handling
-            lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            
-            # Apply CLAHE with variable clip limit based on contrast level
-            clip_limit = 2.0 * self.contrast_level
-            clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
-            l = clahe.apply(l)
-            
-            # Apply brightness adjustment
+        if self.contrast_level <= 1.0 and self.brightness_level == 0:
+            return frame
+        
+        if self._ycrcb_buf is None or self._ycrcb_buf.shape != frame.shape:
+            self._allocate_enhancement_buffers(frame.shape)
+        
+        if self.contrast_level <= 1.0:
+            # Brightness only: shifting B, G and R equally shifts luma the same
+            # way, so a single saturating add replaces the colorspace round-trip.
+            # (convertScaleAbs would mirror negative results instead of clipping.)
+            b = self.brightness_level
+            return cv2.add(frame, (b, b, b, 0), dst=self._bgr_out_buf)
+        
+        # Apply CLAHE with variable clip limit based on contrast level
+        clahe = self._get_clahe(self.contrast_level)
+        
+        if self._use_opencl:
+            # Same steps on UMats; only the finished frame comes back from the GPU
+            ycrcb = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2YCrCb)
+            y = clahe.apply(cv2.extractChannel(ycrcb, 0))
             if self.brightness_level != 0:
-                l = cv2.add(l, self.brightness_level)
-            
-            # Merge and convert back
-            lab = cv2.merge([l, a, b])
-            frame = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+                y = cv2.add(y, self.brightness_level)
+            ycrcb = cv2.insertChannel(y, ycrcb, 0)
+            return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR).get()
+        
+        y = self._y_buf
+        
+        # Work on the luma plane of YCrCb (cheaper than a LAB round-trip)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb, dst=self._ycrcb_buf)
+        cv2.extractChannel(self._ycrcb_buf, 0, dst=y)
+        clahe.apply(y, dst=y)
+        
+        # Apply brightness adjustment
+        if self.brightness_level != 0:
+            cv2.add(y, self.brightness_level, dst=y)
         
-        return frame
+        # Put the luma plane back and convert back
+        cv2.insertChannel(y, self._ycrcb_buf, 0)
+        return cv2.cvtColor(self._ycrcb_buf, cv2.COLOR_YCrCb2BGR, dst=self._bgr_out_buf)
+    
+    def _get_clahe(self, contrast):
+        """Get the display CLAHE object for a contrast level (one is kept per level)."""
+        clahe = self._clahe_cache.get(contrast)
+        if clahe is None:
+            if len(self._clahe_cache) >= 32:
+                self._clahe_cache.clear()  # Levels are arbitrary floats: stay bounded
+            clahe = cv2.createCLAHE(clipLimit=2.0 * contrast, tileGridSize=(8, 8))
+            self._clahe_cache[contrast] = clahe
+        return clahe
+    
+    def _allocate_enhancement_buffers(self, shape):
+        """(Re)allocate the display enhancement scratch buffers for a frame shape."""
+        h, w = shape[:2]
+        self._ycrcb_buf = np.empty(shape, dtype=np.uint8)
+        self._y_buf = np.empty((h, w), dtype=np.uint8)
+        self._bgr_out_buf = np.empty(shape, dtype=np.uint8)
 
     def apply_zoom(self, frame, roi_pixel=None):
         """Apply digital zoom to frame, centered on ROI if available."""
@@ -289,59 +558,110 @@ class VideoCamera(object):
         zoom_w = int(w / self.zoom_level)
         zoom_h = int(h / self.zoom_level)
         
-        # Calculate crop bounds, keeping center in view
-        x1 = max(0, center_x - zoom_w // 2)
-        y1 = max(0, center_y - zoom_h // 2)
-        x2 = min(w, x1 + zoom_w)
-        y2 = min(h, y1 + zoom_h)
-        
-        # Adjust if we hit the edge
-        if x2 == w:
-            x1 = w - zoom_w
-        if y2 == h:
-            y1 = h - zoom_h
+        # Calculate crop origin, keeping the crop inside the frame
+        x1 = max(0, min(center_x - zoom_w // 2, w - zoom_w))
+        y1 = max(0, min(center_y - zoom_h // 2, h - zoom_h))
         
-        # Ensure bounds are valid
-        x1 = max(0, x1)
-        y1 = max(0, y1)
+        # Extract the crop as a contiguous patch (pixel aligned with x1, y1)
+        # and resize it back to original size into a reused buffer
+        cropped = cv2.getRectSubPix(frame, (zoom_w, zoom_h),
+                                    (x1 + (zoom_w - 1) / 2, y1 + (zoom_h - 1) / 2))
+        if self._zoom_out_buf is None or self._zoom_out_buf.shape != frame.shape:
+            self._zoom_out_buf = np.empty_like(frame)
+        cv2.resize(cropped, (w, h), dst=self._zoom_out_buf, interpolation=cv2.INTER_LINEAR)
         
-        # Crop and resize back to original size
-        cropped = frame[y1:y2, x1:x2]
-        zoomed = cv2.resize(cropped, (w, h), interpolation=cv2.INTER_LINEAR)
-        
-        return zoomed
+        return self._zoom_out_buf
+
+    def _motion_size(self, frame):
+        """Get the (width, height) that motion detection runs at for a frame."""
+        h, w = frame.shape[:2]
+        mw, mh = self.MOTION_SIZE
+        # Never upscale small frames
+        return (min(w, mw), min(h, mh))
 
     def process_frame(self, frame):
-        """Process frame for motion detection (grayscale + blur)."""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # Apply CLAHE for better motion detection in low-light
-        gray = self.clahe.apply(gray)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
-        return gray
+        """Process frame for motion detection (downscale + grayscale + blur)."""
+        size = self._motion_size(frame)
+        # No CLAHE here: it re-normalizes every tile per frame, which turns
+        # sensor noise into false motion (it is only used for display)
+        if self._use_opencl:
+            small = cv2.resize(cv2.UMat(frame), size, interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            for _ in range(3):
+                gray = cv2.boxFilter(gray, -1, (3, 3))
+            return gray
+        
+        w, h = size
+        if self._gray_buf is None or self._gray_buf.shape != (h, w):
+            self._small_buf = np.empty((h, w, 3), dtype=np.uint8)
+            self._gray_buf = np.empty((h, w), dtype=np.uint8)
+            # Blur into alternating buffers: the previous result is still in
+            # use as last_frame, so it must not be overwritten by this one
+            self._blur_bufs = (np.empty((h, w), dtype=np.uint8), np.empty((h, w), dtype=np.uint8))
+        cv2.resize(frame, size, dst=self._small_buf, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small_buf, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+        self._blur_idx ^= 1
+        # Three 3x3 box passes approximate the former 7x7 Gaussian (sigma 1.4)
+        # within a few grey levels, using integer sums only. The passes bounce
+        # through the gray buffer, which is no longer needed.
+        out = self._blur_bufs[self._blur_idx]
+        cv2.boxFilter(self._gray_buf, -1, (3, 3), dst=out)
+        cv2.boxFilter(out, -1, (3, 3), dst=self._gray_buf)
+        return cv2.boxFilter(self._gray_buf, -1, (3, 3), dst=out)
 
     def get_frame(self):
         """
-        Get the latest frame for display.
-        Motion detection is handled by the background thread.
-        This method only handles display rendering (overlays, enhancements, zoom).
+        Get the latest encoded frame for display.
+        Rendering and encoding happen once per capture in the background
+        thread, so every stream client shares the same JPEG bytes.
+        """
+        return self._latest_jpeg
+    
+    def wait_for_frame(self, last_frame_id=None, timeout=None):
+        """
+        Block until a frame newer than last_frame_id is published and return
+        (frame_id, jpeg). Clients that fell behind get the latest frame; the
+        ones they missed are dropped. On timeout the current frame is returned
+        with an unchanged id.
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(lambda: self._frame_id != last_frame_id, timeout)
+            return self._frame_id, self._latest_jpeg
+    
+    def _compose_display_frame(self, frame):
+        """
+        Render and encode the display frame into _latest_jpeg and wake up
+        waiting stream clients. Skips the work (and returns False) when
+        neither the frame nor anything drawn on it has changed.
         """
-        # Get the latest frame from background thread
-        with self._frame_lock:
-            if self._latest_raw_frame is None:
-                return None
-            frame = self._latest_raw_frame.copy()
+        state = (int(self.motion_score), self.motion_detected, self._motion_box_id,
+                 self.roi, self.zoom_level, self.contrast_level, self.brightness_level,
+                 self.jpeg_quality)
+        if frame is self._composed_frame and state == self._composed_state:
+            return False
+        
+        jpeg = self._render_frame(frame)
+        self._composed_frame = frame
+        self._composed_state = state
+        with self._frame_cond:
+            self._latest_jpeg = jpeg
+            self._frame_id += 1
+            self._frame_cond.notify_all()
+        return True
+    
+    def _render_frame(self, frame_ref):
+        """Draw overlays on a copy of frame_ref and encode it as JPEG."""
+        # Draw on our own scratch buffer; the raw frame is shared with the
+        # motion detection thread and must stay untouched.
+        if self._draw_scratch is None or self._draw_scratch.shape != frame_ref.shape:
+            self._draw_scratch = np.empty_like(frame_ref)
+        np.copyto(self._draw_scratch, frame_ref)
+        frame = self._draw_scratch
         
         h, w = frame.shape[:2]
         
-        # Calculate ROI pixel coordinates for display
-        roi_pixel = None
-        if self.roi is not None:
-            rx, ry, rw, rh = self.roi
-            roi_x = int(rx * w)
-            roi_y = int(ry * h)
-            roi_w = int(rw * w)
-            roi_h = int(rh * h)
-            roi_pixel = (roi_x, roi_y, roi_w, roi_h)
+        # ROI pixel coordinates for display
+        roi_pixel = self._get_roi_pixel(w, h)
 
         # Draw on frame for debug/feed
         status_color = (0, 255, 0) if self.motion_detected else (0, 0, 255)
@@ -355,8 +675,7 @@ class VideoCamera(object):
         for (x, y, bw, bh) in self._motion_boxes:
             cv2.rectangle(frame, (x, y), (x + bw, y + bh), (0, 255, 0), 2)
 
-        cv2.putText(frame, f"Motion: {int(self.motion_score)}", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+        self._draw_label(frame, f"Motion: {int(self.motion_score)}", (10, 30), 0.7, status_color, 2)
         
         # Apply visual enhancements
         frame = self.apply_enhancements(frame)
@@ -375,12 +694,45 @@ class VideoCamera(object):
         
         if info_texts:
             info_str = " | ".join(info_texts)
-            cv2.putText(frame, info_str, (10, frame.shape[0] - 15), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            self._draw_label(frame, info_str, (10, frame.shape[0] - 15), 0.5, (255, 255, 255), 1)
                    
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes()
-
+        return encode_jpeg(frame, self.jpeg_quality)
+    
+    def _draw_label(self, frame, text, org, scale, color, thickness):
+        """
+        Draw text like cv2.putText, but rasterize each distinct label only
+        once and blend the cached bitmap onto later frames.
+        """
+        key = (text, scale, color, thickness)
+        label = self._label_cache.get(key)
+        if label is None:
+            (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            pad = thickness
+            alpha = np.zeros((th + baseline + 2 * pad, tw + 2 * pad), dtype=np.uint8)
+            cv2.putText(alpha, text, (pad, th + pad), cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness)
+            alpha = cv2.merge((alpha, alpha, alpha))
+            # frame * (255 - alpha) / 255 + color * alpha / 255
+            inv_alpha = cv2.subtract(255, alpha)
+            colored = cv2.multiply(np.full_like(alpha, color), alpha, scale=1 / 255)
+            label = (inv_alpha, colored, pad, th + pad)
+            if len(self._label_cache) >= 64:
+                self._label_cache.clear()  # Scores make many distinct labels: stay bounded
+            self._label_cache[key] = label
+        
+        inv_alpha, colored, ox, oy = label
+        # Clip the label to the frame
+        x0, y0 = org[0] - ox, org[1] - oy
+        lh, lw = inv_alpha.shape[:2]
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1, fy1 = min(x0 + lw, frame.shape[1]), min(y0 + lh, frame.shape[0])
+        if fx0 >= fx1 or fy0 >= fy1:
+            return
+        region = frame[fy0:fy1, fx0:fx1]
+        lx0, ly0 = fx0 - x0, fy0 - y0
+        lx1, ly1 = lx0 + (fx1 - fx0), ly0 + (fy1 - fy0)
+        cv2.multiply(region, inv_alpha[ly0:ly1, lx0:lx1], dst=region, scale=1 / 255)
+        cv2.add(region, colored[ly0:ly1, lx0:lx1], dst=region)
+    
     def is_alarm_active(self):
         """Check if alarm should be active (no motion for ALARM_TIMEOUT_SECONDS)."""
         return (time.time() - self.last_motion_time) > self.ALARM_TIMEOUT_SECONDS
@@ -399,6 +751,9 @@ camera_lock = threading.Lock()
 
 def get_camera():
     global camera
+    # Fast path: once created, the camera never changes, so skip the lock
+    if camera is not None:
+        return camera
     with camera_lock:
         if camera is None:
             print("Initializing camera for the first time...")
@@ -423,28 +778,42 @@ def index():
     return render_template('index.html')
 
 def gen(camera):
+    sent_id = None
     while True:
-        frame = camera.get_frame()
-        if frame:
+        frame_id, frame = camera.wait_for_frame(sent_id, timeout=2.0)
+        # Only send frames this client hasn't seen yet
+        if frame and frame_id != sent_id:
+            sent_id = frame_id
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
-        else:
-            time.sleep(0.1)
 
 @app.route('/video_feed')
 def video_feed():
     return Response(gen(get_camera()),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+# (inputs, JSON body) of the last /status response, swapped as one tuple
+_status_cache = (None, None)
+
 @app.route('/status')
 def status():
+    global _status_cache
     cam = get_camera()
-    return jsonify({
-        'motion_detected': bool(cam.motion_detected),
-        'motion_score': float(cam.motion_score),
-        'alarm_active': cam.is_alarm_active(),
-        'seconds_since_motion': cam.get_seconds_since_motion()
-    })
+    # /status is polled constantly by every client but its inputs only change
+    # on a motion tick or a clock second, so reuse the serialized body until then
+    key = (bool(cam.motion_detected), float(cam.motion_score),
+           cam.is_alarm_active(), cam.get_seconds_since_motion())
+    cached_key, body = _status_cache
+    if key != cached_key:
+        motion_detected, motion_score, alarm_active, seconds_since_motion = key
+        body = json.dumps({
+            'motion_detected': motion_detected,
+            'motion_score': motion_score,
+            'alarm_active': alarm_active,
+            'seconds_since_motion': seconds_since_motion
+        })
+        _status_cache = (key, body)
+    return Response(body, mimetype='application/json')
 
 @app.route('/set_roi', methods=['POST'])
 def set_roi():
@@ -473,7 +842,7 @@ def reset_roi():
 
 @app.route('/set_enhancements', methods=['POST'])
 def set_enhancements():
-    """Set zoom, contrast, and brightness enhancement levels."""
+    """Set zoom, contrast, brightness and stream quality levels."""
     cam = get_camera()
     data = request.get_json()
     
@@ -505,11 +874,20 @@ def set_enhancements():
         else:
             return jsonify({'status': 'error', 'message': 'Brightness must be between -50 and 50'}), 400
     
+    if 'quality' in data:
+        quality = int(data['quality'])
+        if 30 <= quality <= 95:
+            cam.jpeg_quality = quality
+            print(f"Stream quality set to: {quality}")
+        else:
+            return jsonify({'status': 'error', 'message': 'Quality must be between 30 and 95'}), 400
+    
     return jsonify({
         'status': 'ok',
         'zoom': cam.zoom_level,
         'contrast': cam.contrast_level,
-        'brightness': cam.brightness_level
+        'brightness': cam.brightness_level,
+        'quality': cam.jpeg_quality
     })
 
 @app.route('/get_settings')
@@ -523,6 +901,7 @@ def get_settings():
             'zoom': 1.0,
             'contrast': 1.0,
             'brightness': 0,
+            'quality': cam.jpeg_quality,
             'has_roi': False,
             'roi': None
         })
@@ -531,6 +910,7 @@ def get_settings():
         'zoom': cam.zoom_level,
         'contrast': cam.contrast_level,
         'brightness': cam.brightness_level,
+        'quality': cam.jpeg_quality,
         'has_roi': cam.roi is not None,
         'roi': cam.roi
     })
@@ -540,14 +920,35 @@ def reset_enhancements():
     """Reset all enhancements to default values."""
     cam = get_camera()
     
+    # Both camera types stream at an adjustable quality
+    cam.jpeg_quality = cam.JPEG_QUALITY
+    
     if isinstance(cam, VideoCamera):
         cam.zoom_level = 1.0
         cam.contrast_level = 1.0
         cam.brightness_level = 0
-        print("Enhancements reset to defaults.")
+    print("Enhancements reset to defaults.")
     
     return jsonify({'status': 'ok'})
 
+@app.route('/motion_interval', methods=['GET', 'POST'])
+def motion_interval():
+    """Get or set how often motion detection runs (every Nth frame)."""
+    cam = get_camera()
+    
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        if 'every' not in data:
+            return jsonify({'status': 'error', 'message': 'Missing every'}), 400
+        every = int(data['every'])
+        if not 1 <= every <= 10:
+            return jsonify({'status': 'error', 'message': 'every must be between 1 and 10'}), 400
+        cam.motion_every = every
+        print(f"Motion detection runs every {every} frame(s)")
+        return jsonify({'status': 'ok', 'every': cam.motion_every})
+    
+    return jsonify({'every': cam.motion_every})
+
 
 # ==================== Sleep Monitoring Endpoints ====================
 
@@ -634,5 +1035,15 @@ def historical_sleep_report(session_id):
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    # Every open video feed holds a worker thread, so serve with waitress'
+    # thread pool when available instead of the Werkzeug debug server.
+    # On Linux, gunicorn works too: gunicorn -k gthread --threads 16 -b 0.0.0.0:5000 app:app
+    try:
+        from waitress import serve
+    except ImportError:
+        print("waitress not installed, using the Flask development server.")
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    else:
+        print("Serving on http://0.0.0.0:5000 (waitress)")
+        serve(app, host='0.0.0.0', port=5000, threads=8)
 
@@ -0,0 +1,189 @@
+"""
+Numeric kernels for the sleep manager.
+
+The per-update numerics of sleep_manager.py live here as plain loops over
+NumPy arrays and scalars. They are JIT-compiled with Numba when it is
+installed (compiled code is cached next to this file, so only the first
+start pays for it) and run as plain Python otherwise. Set
+NUMBA_DISABLE_JIT=1 to run them uncompiled for debugging.
+"""
+
+import logging
+
+import numpy as np
+
+# Numba is optional: without it the kernels below run as plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+# Numba logs its compiler internals at DEBUG level; keep them out of our log
+logging.getLogger('numba').setLevel(logging.WARNING)
+
+
+@njit(cache=True)
+def ring_tail_stats(ring, head, count, n):
+    """
+    Mean and sample standard deviation of the newest min(n, count) values of
+    a ring buffer whose next write position is head, in one Welford pass.
+    """
+    n = min(n, count)
+    size = ring.shape[0]
+    mean = 0.0
+    m2 = 0.0
+    for k in range(n):
+        x = ring[(head - n + k) % size]
+        delta = x - mean
+        mean += delta / (k + 1)
+        m2 += delta * (x - mean)
+    std = (m2 / (n - 1)) ** 0.5 if n > 1 else 0.0
+    return mean, std
+
+
+@njit(cache=True)
+def window_stats(scores, movement_threshold):
+    """
+    Mean, sample std, min, max and the fraction of values above
+    movement_threshold of a window of scores, in a single pass
+    (Welford's algorithm for the variance). All zeros for an empty window.
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    low = 0.0
+    high = 0.0
+    high_count = 0
+    for x in scores:
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        if n == 1 or x < low:
+            low = x
+        if n == 1 or x > high:
+            high = x
+        if x > movement_threshold:
+            high_count += 1
+    std = (m2 / (n - 1)) ** 0.5 if n > 1 else 0.0
+    return mean, std, low, high, high_count / max(n, 1)
+
+
+@njit(cache=True)
+def roll_window(timestamps, scores, head, end, cutoff, spasm_cutoff, movement_threshold,
+                n, mean, m2, high_count):
+    """
+    Advance the running stats of the analysis window to its newest sample.
+    
+    The window holds samples [head, end - 1) of the buffer arrays, whose
+    Welford state is (n, mean, m2) with high_count of them above
+    movement_threshold. Samples older than cutoff are removed and the newest
+    sample (end - 1) is added. Returns the new (head, n, mean, m2,
+    high_count) and the max score at or after spasm_cutoff.
+    """
+    # Evict expired samples (stops at the newest sample at the latest)
+    while timestamps[head] < cutoff:
+        x = scores[head]
+        if n > 1:
+            old_mean = mean
+            mean -= (x - old_mean) / (n - 1)
+            m2 -= (x - mean) * (x - old_mean)
+        else:
+            mean = 0.0
+            m2 = 0.0
+        n -= 1
+        if x > movement_threshold:
+            high_count -= 1
+        head += 1
+    
+    # Add the newest sample
+    x = scores[end - 1]
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    m2 += delta * (x - mean)
+    if x > movement_threshold:
+        high_count += 1
+    
+    # Max over the (shorter) spasm window, scanning back from the newest sample
+    spasm_max = x
+    i = end - 2
+    while i >= head and timestamps[i] >= spasm_cutoff:
+        if scores[i] > spasm_max:
+            spasm_max = scores[i]
+        i -= 1
+    return head, n, mean, m2, high_count, spasm_max
+
+
+@njit(cache=True, fastmath=True)
+def sleep_quality_score(session_duration, total_sleep_s, deep_sleep_s,
+                        wake_ups, spasms, variability):
+    """Sleep quality score (0-100), see sleep_manager.SleepManager._calculate_sleep_quality."""
+    if session_duration < 60 or total_sleep_s < 60:
+        return 0  # Not enough data
+    
+    score = 100
+    
+    # Factor 1: Deep sleep ratio (target: 40-50% for babies)
+    deep_ratio = deep_sleep_s / max(total_sleep_s, 1.0)
+    if deep_ratio < 0.2:
+        score -= 20  # Too little deep sleep
+    elif deep_ratio < 0.35:
+        score -= 10
+    # Optimal is 0.35-0.50, no penalty
+    elif deep_ratio > 0.6:
+        score -= 5  # Too much deep sleep is unusual
+    
+    # Factor 2: Wake-ups (penalize fragmented sleep)
+    # Expected: ~1 wake-up per hour is normal
+    expected_wakes = session_duration / 3600
+    excess_wakes = max(0.0, wake_ups - expected_wakes)
+    score -= min(30, int(excess_wakes * 10))  # -10 per extra wake-up, max -30
+    
+    # Factor 3: Spasms (normal but too many indicates restless sleep)
+    if spasms > 10:
+        score -= min(10, spasms - 10)  # Penalize excessive spasms
+    
+    # Factor 4: Very high breathing variability might indicate restless sleep
+    if variability > 0.4:
+        score -= 10
+    
+    return max(0, min(100, score))
+
+
+@njit(cache=True)
+def detect_breath_peaks(scores, timestamps, threshold, min_interval, max_interval,
+                        in_peak, last_peak_time):
+    """
+    sleep_manager.BreathingAnalyzer.process_motion over a batch of samples.
+    
+    last_peak_time is NaN when there is none. Returns the accepted interval per
+    sample (NaN where no breath was counted), a flag per sample that is set
+    when the sample's timestamp is recorded as a breath, and the final
+    (in_peak, last_peak_time).
+    """
+    n = len(scores)
+    intervals = np.full(n, np.nan)
+    breaths = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        if scores[i] > threshold:
+            if not in_peak:
+                # New breath detected
+                in_peak = True
+                t = timestamps[i]
+                if last_peak_time == last_peak_time:  # Not NaN
+                    interval = t - last_peak_time
+                    last_peak_time = t
+                    if min_interval <= interval <= max_interval:
+                        breaths[i] = True
+                        intervals[i] = interval
+                    elif interval > max_interval:
+                        breaths[i] = True
+                else:
+                    # First breath
+                    last_peak_time = t
+                    breaths[i] = True
+        else:
+            in_peak = False
+    return intervals, breaths, in_peak, last_peak_time
@@ -11,26 +11,58 @@ Tracks baby's sleep patterns using motion detection data with:
 
 import time
 import logging
-import statistics
+import logging.handlers
+import queue
+import atexit
 import json
 import os
 import uuid
 from datetime import datetime
-from enum import Enum
-from typing import List, Dict, Any, Optional, Tuple
+from enum import Enum, IntEnum
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
 from collections import deque
 import threading
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler('sleep_manager.log'),
-        logging.StreamHandler()
-    ]
-)
+import numpy as np
+
+from sleep_kernels import (ring_tail_stats, window_stats, roll_window, detect_breath_peaks,
+                           sleep_quality_score)
+
 logger = logging.getLogger('SleepManager')
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _start_logging():
+    """
+    Send the sleep manager's log to sleep_manager.log and the console.
+    Records are queued and written by a listener thread so file and console
+    I/O never blocks update(). Done when the app first gets its manager, not
+    at import, so importing the module (e.g. in tests) creates no files.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    formatter = logging.Formatter('%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+    handlers = [logging.FileHandler('sleep_manager.log'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class SleepStateCode(IntEnum):
+    """Integer codes mirroring SleepState, used on the per-update hot path."""
+    UNKNOWN = 0
+    NO_BREATHING = 1
+    DEEP_SLEEP = 2
+    LIGHT_SLEEP = 3
+    SPASM = 4
+    AWAKE = 5
 
 
 class SleepState(Enum):
@@ -41,14 +73,67 @@ class SleepState(Enum):
     LIGHT_SLEEP = "light_sleep"     # Active Sleep / REM - irregular breathing
     SPASM = "spasm"                 # Temporary movement during sleep
     AWAKE = "awake"                 # Sustained active movement
+    
+    def __init__(self, value):
+        self.code = int(SleepStateCode[self.name])
+
+
+# Plain int bitmasks over state codes (member lookups on Enum classes are slow)
+_DEEP_BIT = 1 << SleepStateCode.DEEP_SLEEP
+_LIGHT_BIT = 1 << SleepStateCode.LIGHT_SLEEP
+_SPASM_BIT = 1 << SleepStateCode.SPASM
+_UNKNOWN_BIT = 1 << SleepStateCode.UNKNOWN
+_ASLEEP_MASK = _DEEP_BIT | _LIGHT_BIT | _SPASM_BIT   # States counted as sleep
 
 
-class SleepEvent:
+def _transition_matrix(transitions: Dict) -> np.ndarray:
+    """Boolean [from_code, to_code] matrix of the allowed state transitions."""
+    matrix = np.zeros((len(SleepState), len(SleepState)), dtype=np.bool_)
+    for from_state, targets in transitions.items():
+        for to_state in targets:
+            matrix[from_state.code, to_state.code] = True
+    return matrix
+
+
+class BufferAnalysis(NamedTuple):
+    """Result of one motion buffer analysis."""
+    mean: float = 0.0
+    std: float = 0.0
+    high_movement_ratio: float = 0.0
+    is_no_motion: bool = False
+    sample_count: int = 0
+    spasm_max: float = 0.0
+    current_score: float = 0.0
+    breathing_rate: float = 0.0
+    breathing_variability: float = 0.0
+    sleep_phase: str = 'unknown'
+    breath_count: int = 0
+
+
+class StatsSnapshot(NamedTuple):
+    """Immutable snapshot of the session numbers behind get_stats() and reports."""
+    current_state: str
+    breathing_detected: bool
+    state_duration: float
+    session_duration: float
+    total_sleep_seconds: float
+    deep_sleep_seconds: float
+    light_sleep_seconds: float
+    sleep_quality: int
+    wake_ups: int
+    spasms: int
+    sleep_cycles_completed: int
+    average_cycle_minutes: float
+    analysis: BufferAnalysis
+    events_count: int
+    pending_transition: Optional[str]
+
+
+class SleepEvent(NamedTuple):
     """Represents a sleep-related event."""
-    def __init__(self, event_type: str, timestamp: float, data: Optional[Dict] = None):
-        self.event_type = event_type
-        self.timestamp = timestamp
-        self.data = data or {}
+    event_type: str
+    timestamp: float
+    data: Optional[Dict] = None
 
 
 class BreathingAnalyzer:
@@ -66,16 +151,25 @@ class BreathingAnalyzer:
     LOW_VARIABILITY_THRESHOLD = 0.15   # < 15% = Deep Sleep
     HIGH_VARIABILITY_THRESHOLD = 0.30  # > 30$ = Light/REM Sleep
     
+    INTERVAL_HISTORY = 50              # Number of recent intervals kept
+    
+    __slots__ = ('breath_timestamps', '_intervals', '_interval_head', '_interval_count',
+                 'last_peak_time', 'in_peak')
+    
     def __init__(self):
         self.breath_timestamps: deque = deque(maxlen=100)  # Last 100 detected breaths
-        self.breath_intervals: deque = deque(maxlen=50)    # Last 50 intervals
+        # Last INTERVAL_HISTORY intervals, as a ring buffer
+        self._intervals = np.zeros(self.INTERVAL_HISTORY)
+        self._interval_head = 0   # Next write position
+        self._interval_count = 0
         self.last_peak_time: Optional[float] = None
         self.in_peak: bool = False
         
     def reset(self):
         """Reset the analyzer."""
         self.breath_timestamps.clear()
-        self.breath_intervals.clear()
+        self._interval_head = 0
+        self._interval_count = 0
         self.last_peak_time = None
         self.in_peak = False
     
@@ -98,7 +192,7 @@ class BreathingAnalyzer:
                     # Validate interval is reasonable
                     if self.MIN_BREATH_INTERVAL <= interval <= self.MAX_BREATH_INTERVAL:
                         self.breath_timestamps.append(timestamp)
-                        self.breath_intervals.append(interval)
+                        self._add_interval(interval)
                         return interval
                     # If interval is too long, treat as first breath of new sequence
                     elif interval > self.MAX_BREATH_INTERVAL:
@@ -112,17 +206,46 @@ class BreathingAnalyzer:
         
         return None
     
+    def find_breaths(self, scores: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run the breath peak detection of process_motion over a batch of
+        samples, in timestamp order. Only the peak tracking state is updated:
+        the caller hands each breath to record_breath() when it reaches that
+        sample. Returns the interval at each sample (NaN where none was
+        accepted) and a flag per sample that is set for breaths.
+        """
+        last_peak_time = self.last_peak_time if self.last_peak_time is not None else np.nan
+        intervals, breaths, in_peak, last_peak_time = detect_breath_peaks(
+            np.asarray(scores, dtype=np.float64), np.asarray(timestamps, dtype=np.float64),
+            float(self.BREATH_PEAK_THRESHOLD), self.MIN_BREATH_INTERVAL, self.MAX_BREATH_INTERVAL,
+            self.in_peak, last_peak_time)
+        self.in_peak = bool(in_peak)
+        self.last_peak_time = None if np.isnan(last_peak_time) else float(last_peak_time)
+        return intervals, breaths
+    
+    def record_breath(self, timestamp: float, interval: float):
+        """Record a breath found by find_breaths() (interval NaN if none was accepted)."""
+        self.breath_timestamps.append(timestamp)
+        if interval == interval:  # Not NaN
+            self._add_interval(interval)
+    
+    def _add_interval(self, interval: float):
+        """Record an inter-breath interval, overwriting the oldest when full."""
+        self._intervals[self._interval_head] = interval
+        self._interval_head = (self._interval_head + 1) % self.INTERVAL_HISTORY
+        self._interval_count = min(self._interval_count + 1, self.INTERVAL_HISTORY)
+    
     def get_breathing_rate(self) -> float:
         """
         Calculate current breathing rate in breaths per minute.
         Returns 0 if not enough data.
         """
-        if len(self.breath_intervals) < 3:
+        if self._interval_count < 3:
             return 0.0
         
         # Use recent intervals
-        recent = list(self.breath_intervals)[-10:]
-        avg_interval = statistics.mean(recent)
+        avg_interval, _ = ring_tail_stats(self._intervals, self._interval_head,
+                                           self._interval_count, 10)
         
         if avg_interval > 0:
             return 60.0 / avg_interval
@@ -134,23 +257,24 @@ class BreathingAnalyzer:
         CV = std / mean - gives a normalized measure of variability.
         Returns 0 if not enough data.
         """
-        if len(self.breath_intervals) < 5:
+        if self._interval_count < 5:
             return 0.0
         
-        recent = list(self.breath_intervals)[-20:]
-        mean_interval = statistics.mean(recent)
+        mean_interval, std_interval = ring_tail_stats(self._intervals, self._interval_head,
+                                                       self._interval_count, 20)
         
-        if mean_interval > 0 and len(recent) >= 2:
-            std_interval = statistics.stdev(recent)
+        if mean_interval > 0:
             return std_interval / mean_interval
         return 0.0
     
-    def get_sleep_phase(self) -> str:
+    def get_sleep_phase(self, variability: Optional[float] = None) -> str:
         """
-        Determine sleep phase based on breathing variability.
+        Determine sleep phase based on breathing variability
+        (computed here unless the caller already has it).
         Returns: 'deep', 'light', or 'unknown'
         """
-        variability = self.get_breathing_variability()
+        if variability is None:
+            variability = self.get_breathing_variability()
         
         if variability == 0:
             return 'unknown'
@@ -168,10 +292,81 @@ class BreathingAnalyzer:
             'breathing_variability': round(self.get_breathing_variability(), 3),
             'sleep_phase': self.get_sleep_phase(),
             'breath_count': len(self.breath_timestamps),
-            'intervals_recorded': len(self.breath_intervals),
+            'intervals_recorded': self._interval_count,
         }
 
 
+class MotionBuffer:
+    """
+    Time-ordered (timestamp, score) samples kept in two parallel NumPy arrays.
+    
+    Old samples are dropped by advancing a start index, so the live samples
+    are always the contiguous slice [start:end] and any time window is a
+    view found by binary search. The arrays are compacted (or grown) only
+    when the end reaches their capacity.
+    """
+    
+    def __init__(self, capacity: int = 512):
+        self.timestamps = np.empty(capacity)
+        self.scores = np.empty(capacity)
+        self.start = 0
+        self.end = 0
+        self.base = 0   # Absolute index (samples ever appended) of array position 0
+    
+    def __len__(self) -> int:
+        return self.end - self.start
+    
+    def clear(self):
+        """Drop all samples."""
+        self.base += self.end
+        self.start = self.end = 0
+    
+    def append(self, timestamp: float, score: float):
+        """Add a sample (timestamps must not decrease)."""
+        if self.end == len(self.timestamps):
+            self._make_room()
+        self.timestamps[self.end] = timestamp
+        self.scores[self.end] = score
+        self.end += 1
+    
+    def _make_room(self):
+        """Move the live samples to the front, doubling the arrays if over half full."""
+        count = len(self)
+        timestamps, scores = self.timestamps, self.scores
+        if count > len(timestamps) // 2:
+            timestamps = np.empty(len(self.timestamps) * 2)
+            scores = np.empty(len(self.scores) * 2)
+        timestamps[:count] = self.timestamps[self.start:self.end]
+        scores[:count] = self.scores[self.start:self.end]
+        self.timestamps, self.scores = timestamps, scores
+        self.base += self.start
+        self.start, self.end = 0, count
+    
+    def _index_at(self, timestamp: float) -> int:
+        """Index of the first live sample at or after timestamp."""
+        return self.start + int(np.searchsorted(self.timestamps[self.start:self.end], timestamp))
+    
+    def drop_before(self, cutoff: float):
+        """Drop samples older than cutoff."""
+        # Usually none or one sample has aged out since the last call: step
+        # past those directly and only binary search after a gap
+        start, end, timestamps = self.start, self.end, self.timestamps
+        while start < end and timestamps[start] < cutoff:
+            start += 1
+            if start - self.start > 4:
+                start = self._index_at(cutoff)
+                break
+        self.start = start
+    
+    def scores_since(self, timestamp: float) -> np.ndarray:
+        """View of the scores of samples at or after timestamp."""
+        return self.scores[self._index_at(timestamp):self.end]
+    
+    def last_score(self) -> float:
+        """Most recent score (0 if empty)."""
+        return float(self.scores[self.end - 1]) if self.end > self.start else 0.0
+
+
 class SleepManager:
     """
     Advanced sleep state detection and quality analysis.
@@ -195,6 +390,8 @@ class SleepManager:
     BUFFER_DURATION = 60.0              # Keep 60 seconds of history
     ANALYSIS_WINDOW = 10.0              # Analyze last 10 seconds
     SPASM_WINDOW = 5.0                  # Spasm detection window
+    ANALYSIS_MAX_AGE = 0.5              # get_stats() reuses update()'s analysis this long
+    MIN_UPDATE_INTERVAL = 0.0           # Min seconds between state evaluations (0 = every update)
     
     # Hysteresis - confirmation times
     CONFIRM_AWAKE_SECONDS = 8.0         # Sustained movement to confirm awake
@@ -202,40 +399,72 @@ class SleepManager:
     CONFIRM_NO_BREATHING_SECONDS = 12.0 # Silence to trigger alert
     CONFIRM_PHASE_CHANGE_SECONDS = 30.0 # Time to confirm sleep phase change
     
-    # History file path
-    HISTORY_FILE = "sleep_history.json"
+    MAX_EVENTS = 1000                   # Events kept in memory per session
     
-    # Valid state transitions
+    # History file path (JSON Lines, one session per line)
+    HISTORY_FILE = "sleep_history.jsonl"
+    LEGACY_HISTORY_FILE = "sleep_history.json"  # Older single-array format
+    HISTORY_LIMIT = 100                 # Sessions kept in the history
+    HISTORY_COMPACT_EVERY = 10          # Entries past the limit before the file is trimmed
+    
+    # Valid state transitions (every state has an entry)
     VALID_TRANSITIONS = {
-        SleepState.UNKNOWN: [SleepState.NO_BREATHING, SleepState.DEEP_SLEEP, 
-                             SleepState.LIGHT_SLEEP, SleepState.AWAKE],
-        SleepState.NO_BREATHING: [SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, 
-                                   SleepState.AWAKE],
-        SleepState.DEEP_SLEEP: [SleepState.LIGHT_SLEEP, SleepState.SPASM, 
-                                 SleepState.NO_BREATHING, SleepState.AWAKE],
-        SleepState.LIGHT_SLEEP: [SleepState.DEEP_SLEEP, SleepState.SPASM, 
-                                  SleepState.NO_BREATHING, SleepState.AWAKE],
-        SleepState.SPASM: [SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, 
-                           SleepState.AWAKE],
-        SleepState.AWAKE: [SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP],
+        SleepState.UNKNOWN: frozenset({SleepState.NO_BREATHING, SleepState.DEEP_SLEEP, 
+                                       SleepState.LIGHT_SLEEP, SleepState.AWAKE}),
+        SleepState.NO_BREATHING: frozenset({SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, 
+                                            SleepState.AWAKE}),
+        SleepState.DEEP_SLEEP: frozenset({SleepState.LIGHT_SLEEP, SleepState.SPASM, 
+                                          SleepState.NO_BREATHING, SleepState.AWAKE}),
+        SleepState.LIGHT_SLEEP: frozenset({SleepState.DEEP_SLEEP, SleepState.SPASM, 
+                                           SleepState.NO_BREATHING, SleepState.AWAKE}),
+        SleepState.SPASM: frozenset({SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, 
+                                     SleepState.AWAKE}),
+        SleepState.AWAKE: frozenset({SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP}),
     }
+    _VALID_MATRIX = _transition_matrix(VALID_TRANSITIONS)
     
     def __init__(self):
         """Initialize the sleep manager."""
-        # Use RLock (re-entrant lock) to allow nested calls like get_sleep_report() -> get_stats()
+        # Use RLock (re-entrant lock) to allow nested calls like stop_session() -> get_sleep_report()
         self.lock = threading.RLock()
+        # Thread writing the last saved session to the history file
+        self._history_writer: Optional[threading.Thread] = None
+        # Guards the history file; _history_lines is its line count once it
+        # has been migrated and trimmed (None until then)
+        self._history_file_lock = threading.Lock()
+        self._history_lines: Optional[int] = None
+        # Saved sessions by id, oldest first (loaded from the file on first use)
+        self._history_index: Optional[Dict[str, Dict]] = None
         self.breathing_analyzer = BreathingAnalyzer()
         self.session_id: Optional[str] = None
+        self._build_confirmation_times()
         self._reset_session()
         
     def _reset_session(self):
         """Reset all session data."""
         self.session_id = str(uuid.uuid4())
+        # Internal times are time.monotonic() seconds; the wall-clock start
+        # anchors the timestamps that are exported
         self.session_start_time: Optional[float] = None
+        self.session_start_wall: Optional[float] = None
+        # For a session fed by update_many(): the last replayed timestamp,
+        # which stands in for the clock (None for a live session)
+        self._replay_time: Optional[float] = None
         self.current_state = SleepState.UNKNOWN
+        self._state_bit = _UNKNOWN_BIT  # 1 << code of current_state
         
         # Motion history buffer: (timestamp, score)
-        self.motion_buffer: deque = deque()
+        self.motion_buffer = MotionBuffer()
+        
+        # Running stats of the samples in the analysis window, kept by _roll_window()
+        # (Welford count/mean/m2, so they stay accurate at motion-score magnitudes)
+        self._win_head = 0      # Absolute buffer index of the oldest sample in the window
+        self._win_time: Optional[float] = None  # Time the window was last rolled to
+        self._win_n = 0
+        self._win_mean = 0.0
+        self._win_m2 = 0.0
+        self._win_high = 0      # Samples in the window above MOVEMENT_THRESHOLD
+        self._spasm_max = 0.0   # Max score in the spasm window at _win_time
         
         # State tracking
         self.state_start_time: float = 0
@@ -266,137 +495,228 @@ class SleepManager:
         self.sleep_cycles: List[Dict] = []  # Track complete sleep cycles
         self.current_cycle_start: Optional[float] = None
         
-        # Events history
-        self.events: List[SleepEvent] = []
+        # Events history (oldest dropped past MAX_EVENTS)
+        self.events: deque = deque(maxlen=self.MAX_EVENTS)
+        # (events, session_start_time, session_start_wall): republished with a
+        # single store on change and read without the lock, so the events
+        # always come with the clock anchor of their own session
+        self._events_view: Tuple[Tuple[SleepEvent, ...], Optional[float], Optional[float]] = ((), None, None)
         
         # Cache for stats
-        self._last_update_time: float = 0
+        self._last_update_time: float = -np.inf  # No update yet
         self._last_log_time: float = 0
+        self._last_analysis: Optional[BufferAnalysis] = None  # From the last update()
+        # (cache key, snapshot), published with a single store so readers can
+        # check it without the lock
+        self._stats_cache: Optional[Tuple[Tuple[float, int], StatsSnapshot]] = None
+        self._report_cache: Optional[Tuple[StatsSnapshot, Dict[str, Any]]] = None
     
     def start_session(self):
         """Start a new monitoring session."""
         with self.lock:
             self._reset_session()
-            self.session_start_time = time.time()
+            self._mark_session_start(time.monotonic())
             logger.info("Session started")
     
     def stop_session(self):
         """Stop the current monitoring session and save to history."""
         with self.lock:
             if self.last_sleep_start is not None:
-                self.total_sleep_seconds += time.time() - self.last_sleep_start
+                # _update_metrics has counted the sleep up to the last update
+                self.total_sleep_seconds += self._now() - self._last_update_time
                 self.last_sleep_start = None
+                self._stats_cache = None
             
-            # Save to history if session had meaningful data
+            # Save to history if session had meaningful data, with the report
+            # last built if it is still that of the current snapshot
             if self.session_start_time is not None and self.total_sleep_seconds >= 60:
-                self._save_to_history()
+                stats, report = self._stats_cache, self._report_cache
+                current = (stats is not None and report is not None and report[0] is stats[1]
+                           and stats[0] == (self._last_update_time, int(self._now())))
+                self._save_to_history(report[1] if current else None)
             
             logger.info(f"Session stopped. Total sleep: {self.total_sleep_seconds:.1f}s")
     
+    def _mark_session_start(self, current_time: float, wall_time: Optional[float] = None):
+        """Record the session start on both the monotonic and the wall clock."""
+        self.session_start_time = current_time
+        self.session_start_wall = time.time() if wall_time is None else wall_time
+    
+    def _now(self) -> float:
+        """The session clock: time.monotonic(), or the replayed time for a replay."""
+        replay_time = self._replay_time
+        return time.monotonic() if replay_time is None else replay_time
+    
     def update(self, motion_score: float) -> SleepState:
         """
         Update sleep state based on current motion score.
         """
         with self.lock:
-            current_time = time.time()
+            if self._replay_time is not None:
+                raise ValueError("The session holds replayed samples; call start_session() first")
+            current_time = time.monotonic()
             
             # Auto-start session if not started
             if self.session_start_time is None:
-                self.session_start_time = current_time
+                self._mark_session_start(current_time)
             
-            # Add to buffer
-            self.motion_buffer.append((current_time, float(motion_score)))
-
-            # Log current motion score
-            logger.debug(f"Motion Score: {motion_score}")
+            self._add_sample(motion_score, current_time)
             
             # Process breathing
-            breath_interval = self.breathing_analyzer.process_motion(motion_score, current_time)
-            if breath_interval:
-                logger.debug(f"Breath detected: interval={breath_interval:.2f}s, rate={self.breathing_analyzer.get_breathing_rate():.1f} BPM")
+            breathing = self.breathing_analyzer
+            breath_interval = breathing.process_motion(motion_score, current_time)
+            if breath_interval and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Breath detected: interval=%.2fs, rate=%.1f BPM",
+                             breath_interval, breathing.get_breathing_rate())
             
-            # Clean old entries from buffer
-            self._clean_buffer(current_time)
-            
-            # Analyze the buffer and determine state
-            analysis = self._analyze_buffer(current_time)
-            
-            # Determine target state based on analysis
-            target_state = self._determine_state(analysis, current_time)
-            
-            # Handle state transition with hysteresis
-            self._handle_transition(target_state, current_time, analysis)
-            
-            # Update metrics
-            self._update_metrics(current_time, analysis)
+            return self._evaluate(current_time)
+    
+    def update_many(self, scores, timestamps) -> List[SleepState]:
+        """
+        Replay recorded motion scores, e.g. to re-analyze a session.
+        timestamps are the samples' times in seconds on the recording's clock
+        (such as time.time() when they were taken) and must not decrease.
+        The session clock follows them, so durations and event times are
+        those of the recording. A session that already has live samples
+        can't take a replay: call start_session() first.
+        Returns the state after each sample.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if scores.ndim != 1 or scores.shape != timestamps.shape:
+            raise ValueError("scores and timestamps must be 1-D and of the same length")
+        if len(scores) == 0:
+            return []
+        if np.any(np.diff(timestamps) < 0):
+            raise ValueError("timestamps must not decrease")
+        
+        with self.lock:
+            if self._replay_time is None:
+                if self._win_time is not None:
+                    raise ValueError("The session has live samples; call start_session() first")
+                self._mark_session_start(float(timestamps[0]), wall_time=float(timestamps[0]))
+            elif timestamps[0] < self._replay_time:
+                raise ValueError("timestamps must not go back past the samples already replayed")
             
-            self._last_update_time = current_time
+            # Breath peaks only depend on the scores, so they are found for
+            # the whole batch at once; the state machine has to step through
+            # the samples, as every decision depends on the state before it
+            breathing = self.breathing_analyzer
+            intervals, breaths = breathing.find_breaths(scores, timestamps)
+            record_breath = breathing.record_breath
+            add_sample = self._add_sample
+            evaluate = self._evaluate
+            states = []
+            for score, t, breath, interval in zip(scores.tolist(), timestamps.tolist(),
+                                                  breaths.tolist(), intervals.tolist()):
+                self._replay_time = t
+                add_sample(score, t)
+                if breath:
+                    record_breath(t, interval)
+                states.append(evaluate(t))
+            return states
+    
+    def _add_sample(self, motion_score: float, current_time: float):
+        """Buffer a sample and move the analysis window on (caller holds the lock)."""
+        buf = self.motion_buffer
+        buf.append(current_time, float(motion_score))
+        self._roll_window(current_time)
+        
+        # Log current motion score
+        logger.debug("Motion Score: %s", motion_score)
+        
+        # Clean entries older than BUFFER_DURATION from the buffer
+        buf.drop_before(current_time - self.BUFFER_DURATION)
+    
+    def _evaluate(self, current_time: float) -> SleepState:
+        """Re-evaluate the state after the sample at current_time (caller holds the lock)."""
+        # Throttle: samples arriving faster than MIN_UPDATE_INTERVAL are
+        # recorded but do not re-evaluate the state
+        if current_time - self._last_update_time < self.MIN_UPDATE_INTERVAL:
             return self.current_state
+        
+        # Analyze the buffer and determine state
+        analysis = self._analyze_buffer(current_time)
+        self._last_analysis = analysis
+        
+        # Determine target state based on analysis
+        target_state = self._determine_state(analysis, current_time)
+        
+        # Handle state transition with hysteresis
+        self._handle_transition(target_state, current_time, analysis)
+        
+        # Update metrics
+        self._update_metrics(current_time, analysis)
+        
+        self._last_update_time = current_time
+        self._stats_cache = None
+        return self.current_state
+    
+    def _roll_window(self, current_time: float):
+        """Move the analysis window stats on to the newest buffered sample."""
+        buf = self.motion_buffer
+        head, self._win_n, self._win_mean, self._win_m2, self._win_high, spasm_max = roll_window(
+            buf.timestamps, buf.scores, self._win_head - buf.base, buf.end,
+            current_time - self.ANALYSIS_WINDOW, current_time - self.SPASM_WINDOW,
+            float(self.MOVEMENT_THRESHOLD), self._win_n, self._win_mean, self._win_m2,
+            self._win_high)
+        self._win_head = buf.base + head
+        self._spasm_max = float(spasm_max)
+        self._win_time = current_time
     
-    def _clean_buffer(self, current_time: float):
-        """Remove entries older than BUFFER_DURATION."""
-        cutoff = current_time - self.BUFFER_DURATION
-        while self.motion_buffer and self.motion_buffer[0][0] < cutoff:
-            self.motion_buffer.popleft()
+    def _recount_window(self):
+        """Recount the window's high-movement samples (after a threshold change)."""
+        buf = self.motion_buffer
+        window = buf.scores[self._win_head - buf.base:buf.end]
+        self._win_high = int(np.count_nonzero(window > self.MOVEMENT_THRESHOLD))
     
-    def _analyze_buffer(self, current_time: float) -> Dict[str, Any]:
+    def _analyze_buffer(self, current_time: float) -> BufferAnalysis:
         """Analyze the motion buffer and return statistics."""
-        # Get scores within analysis window
-        window_start = current_time - self.ANALYSIS_WINDOW
-        window_scores = [s for t, s in self.motion_buffer if t >= window_start]
-        
-        # Get scores for spasm detection (shorter window)
-        spasm_start = current_time - self.SPASM_WINDOW
-        spasm_scores = [s for t, s in self.motion_buffer if t >= spasm_start]
-        
-        # Calculate statistics
-        if len(window_scores) >= 2:
-            mean_score = statistics.mean(window_scores)
-            std_score = statistics.stdev(window_scores)
-            max_score = max(window_scores)
-            min_score = min(window_scores)
-        elif len(window_scores) == 1:
-            mean_score = window_scores[0]
-            std_score = 0
-            max_score = min_score = window_scores[0]
+        if current_time == self._win_time:
+            # The running stats cover exactly this window
+            sample_count = self._win_n
+            mean_score = self._win_mean
+            std_score = (max(self._win_m2, 0.0) / (sample_count - 1)) ** 0.5 if sample_count > 1 else 0.0
+            high_movement_ratio = self._win_high / sample_count
+            spasm_max = self._spasm_max
         else:
-            mean_score = std_score = max_score = min_score = 0
-        
-        # Calculate spasm window stats
-        spasm_max = max(spasm_scores) if spasm_scores else 0
+            # Window has moved on since the last update: compute it afresh
+            window_scores = self.motion_buffer.scores_since(current_time - self.ANALYSIS_WINDOW)
+            mean_score, std_score, _, _, high_movement_ratio = window_stats(
+                window_scores, self.MOVEMENT_THRESHOLD)
+            sample_count = len(window_scores)
+            spasm_scores = self.motion_buffer.scores_since(current_time - self.SPASM_WINDOW)
+            spasm_max = float(spasm_scores.max()) if len(spasm_scores) else 0
         
         # Breathing analysis
-        breathing_stats = self.breathing_analyzer.get_stats()
-        
-        # Detect sustained high movement
-        high_movement_ratio = sum(1 for s in window_scores if s > self.MOVEMENT_THRESHOLD) / max(len(window_scores), 1)
+        breathing = self.breathing_analyzer
+        variability = breathing.get_breathing_variability()
         
         # Detect no motion - use MEAN
         is_no_motion = mean_score < self.NO_MOTION_THRESHOLD
         
-        return {
-            'mean': mean_score,
-            'std': std_score,
-            'max': max_score,
-            'min': min_score,
-            'high_movement_ratio': high_movement_ratio,
-            'is_no_motion': is_no_motion,
-            'sample_count': len(window_scores),
-            'spasm_max': spasm_max,
-            'current_score': self.motion_buffer[-1][1] if self.motion_buffer else 0,
-            'breathing': breathing_stats,
-        }
+        return BufferAnalysis(
+            mean=mean_score,
+            std=std_score,
+            high_movement_ratio=high_movement_ratio,
+            is_no_motion=is_no_motion,
+            sample_count=sample_count,
+            spasm_max=spasm_max,
+            current_score=self.motion_buffer.last_score(),
+            breathing_rate=breathing.get_breathing_rate(),
+            breathing_variability=variability,
+            sleep_phase=breathing.get_sleep_phase(variability),
+            breath_count=len(breathing.breath_timestamps),
+        )
     
-    def _determine_state(self, analysis: Dict, current_time: float) -> SleepState:
+    def _determine_state(self, analysis: BufferAnalysis, current_time: float) -> SleepState:
         """Determine target state based on buffer analysis."""
-        mean = analysis['mean']
-        high_ratio = analysis['high_movement_ratio']
-        is_no_motion = analysis['is_no_motion']
-        spasm_max = analysis['spasm_max']
-        breathing = analysis['breathing']
+        mean = analysis.mean
+        high_ratio = analysis.high_movement_ratio
+        spasm_max = analysis.spasm_max
         
         # Priority 1: No breathing detection
-        if is_no_motion:
+        if analysis.is_no_motion:
             return SleepState.NO_BREATHING
         
         # Priority 2: Check for sustained high movement (awake)
@@ -404,13 +724,13 @@ class SleepManager:
             return SleepState.AWAKE
         
         # Priority 3: Spasm detection - sudden spike during sleep
-        if self.current_state in (SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, SleepState.SPASM):
+        if self._state_bit & _ASLEEP_MASK:
             if spasm_max > self.AWAKE_THRESHOLD and high_ratio < 0.3:
                 return SleepState.SPASM
         
         # Priority 4: Determine sleep phase based on breathing variability
         if mean < self.AWAKE_THRESHOLD:
-            sleep_phase = breathing.get('sleep_phase', 'unknown')
+            sleep_phase = analysis.sleep_phase
             
             if sleep_phase == 'deep':
                 return SleepState.DEEP_SLEEP
@@ -419,22 +739,22 @@ class SleepManager:
             else:
                 # Default to light sleep if we can't determine phase
                 # More conservative - assumes baby is in lighter sleep
-                return SleepState.LIGHT_SLEEP if self.current_state == SleepState.UNKNOWN else self.current_state
+                return SleepState.LIGHT_SLEEP if self._state_bit == _UNKNOWN_BIT else self.current_state
         
         # Default
-        return self.current_state if self.current_state != SleepState.UNKNOWN else SleepState.LIGHT_SLEEP
+        return self.current_state if self._state_bit != _UNKNOWN_BIT else SleepState.LIGHT_SLEEP
     
     def _handle_transition(self, target_state: SleepState, 
-                           current_time: float, analysis: Dict):
+                           current_time: float, analysis: BufferAnalysis):
         """Handle state transitions with hysteresis."""
         # Check if transition is valid
-        if target_state not in self.VALID_TRANSITIONS.get(self.current_state, []):
+        if not self._VALID_MATRIX[self.current_state.code, target_state.code]:
             if target_state != self.current_state:
                 target_state = self._find_valid_transition(target_state)
         
         # Same state - handle pending
         if target_state == self.current_state:
-            if self.current_state == SleepState.SPASM:
+            if self._state_bit == _SPASM_BIT:
                 if current_time - self.spasm_start_time > self.SPASM_WINDOW:
                     self._execute_transition(self.pre_spasm_state or SleepState.LIGHT_SLEEP, 
                                             current_time, "spasm_ended")
@@ -445,7 +765,7 @@ class SleepManager:
             return
         
         # Get required confirmation time
-        confirm_time = self._get_confirmation_time(self.current_state, target_state)
+        confirm_time = self._confirm_times[self.current_state.code][target_state.code]
         
         # Start or continue pending transition
         if self.pending_state == target_state:
@@ -454,8 +774,8 @@ class SleepManager:
         else:
             self.pending_state = target_state
             self.pending_state_time = current_time
-            logger.debug(f"Pending transition: {self.current_state.value} -> {target_state.value} "
-                        f"(need {confirm_time:.1f}s confirmation)")
+            logger.debug("Pending transition: %s -> %s (need %.1fs confirmation)",
+                         self.current_state.value, target_state.value, confirm_time)
     
     def _find_valid_transition(self, target_state: SleepState) -> SleepState:
         """Find a valid intermediate state for transition."""
@@ -465,6 +785,12 @@ class SleepManager:
             return target_state
         return self.current_state
     
+    def _build_confirmation_times(self):
+        """Tabulate _get_confirmation_time() as [from_code][to_code] (redo after threshold changes)."""
+        states = sorted(SleepState, key=lambda state: state.code)
+        self._confirm_times = [[self._get_confirmation_time(from_state, to_state) for to_state in states]
+                               for from_state in states]
+    
     def _get_confirmation_time(self, from_state: SleepState, to_state: SleepState) -> float:
         """Get the required confirmation time for a state transition."""
         if to_state == SleepState.SPASM:
@@ -531,97 +857,138 @@ class SleepManager:
         if new_state == SleepState.NO_BREATHING:
             self.events.append(SleepEvent("no_breathing_alert", current_time))
         
+        self._events_view = (tuple(self.events), self.session_start_time, self.session_start_wall)
+        
         # Execute transition
         self.current_state = new_state
+        self._state_bit = 1 << new_state.code
         self.state_start_time = current_time
         self.pending_state = None
         self.pending_state_time = None
         
         logger.info(f"State transition: {old_state.value} -> {new_state.value} ({reason})")
     
-    def _update_metrics(self, current_time: float, analysis: Dict):
+    def _update_metrics(self, current_time: float, analysis: BufferAnalysis):
         """Update tracking metrics."""
-        if self._last_update_time > 0:
+        if self._last_update_time > -np.inf:
             delta = current_time - self._last_update_time
             
             # Update sleep phase times
-            if self.current_state == SleepState.DEEP_SLEEP:
-                self.deep_sleep_seconds += delta
-                self.total_sleep_seconds += delta
-            elif self.current_state == SleepState.LIGHT_SLEEP:
-                self.light_sleep_seconds += delta
-                self.total_sleep_seconds += delta
-            elif self.current_state == SleepState.SPASM:
-                # Spasms count as sleep (they happen during sleep)
-                self.light_sleep_seconds += delta
+            state_bit = self._state_bit
+            if state_bit & _ASLEEP_MASK:
                 self.total_sleep_seconds += delta
+                if state_bit == _DEEP_BIT:
+                    self.deep_sleep_seconds += delta
+                else:
+                    # Spasms count as light sleep (they happen during sleep)
+                    self.light_sleep_seconds += delta
     
-    def get_stats(self) -> Dict[str, Any]:
-        """Get current sleep statistics."""
+    def _stats_snapshot(self) -> StatsSnapshot:
+        """Snapshot the current session numbers (cheap while nothing changed)."""
+        # Nothing but the clock changes between updates: reuse the last
+        # snapshot while it is current to the second (durations are reported
+        # in whole seconds). The published snapshot is checked without the
+        # lock so readers don't hold up update().
+        current_time = self._now()
+        cached = self._stats_cache
+        if cached is not None and cached[0] == (self._last_update_time, int(current_time)):
+            return cached[1]
+        
         with self.lock:
-            current_time = time.time()
+            current_time = self._now()
+            cache_key = (self._last_update_time, int(current_time))
+            cached = self._stats_cache
+            if cached is not None and cached[0] == cache_key:
+                return cached[1]
             
             # Calculate session duration
             session_duration = 0
             if self.session_start_time is not None:
                 session_duration = current_time - self.session_start_time
             
-            # Current analysis
-            analysis = self._analyze_buffer(current_time) if self.motion_buffer else {}
-            breathing = analysis.get('breathing', {})
+            # Current analysis: reuse the one update() just made unless updates
+            # have stopped and the window has moved on
+            analysis = self._last_analysis
+            if analysis is None or current_time - self._last_update_time >= self.ANALYSIS_MAX_AGE:
+                analysis = self._analyze_buffer(current_time)
+            
+            # Sleep cycle info
+            avg_cycle = 0
+            if self.sleep_cycles:
+                avg_cycle = sum(c['duration_minutes'] for c in self.sleep_cycles) / len(self.sleep_cycles)
+            
+            snapshot = StatsSnapshot(
+                current_state=self.current_state.value,
+                breathing_detected=self.current_state in (SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP),
+                state_duration=current_time - self.state_start_time if self.state_start_time > 0 else 0,
+                session_duration=session_duration,
+                total_sleep_seconds=self.total_sleep_seconds,
+                deep_sleep_seconds=self.deep_sleep_seconds,
+                light_sleep_seconds=self.light_sleep_seconds,
+                sleep_quality=self._calculate_sleep_quality(session_duration),
+                wake_ups=self.wake_up_count,
+                spasms=self.spasm_count,
+                sleep_cycles_completed=len(self.sleep_cycles),
+                average_cycle_minutes=avg_cycle,
+                analysis=analysis,
+                events_count=len(self.events),
+                pending_transition=self.pending_state.value if self.pending_state else None,
+            )
+            self._stats_cache = (cache_key, snapshot)
+            return snapshot
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current sleep statistics."""
+        return self._stats_dict(self._stats_snapshot())
+    
+    @staticmethod
+    def _stats_dict(snap: StatsSnapshot) -> Dict[str, Any]:
+        """The public statistics dict for a snapshot."""
+        analysis = snap.analysis
+        total_sleep = max(snap.total_sleep_seconds, 1)
+        return {
+            # Current State
+            "current_state": snap.current_state,
+            "breathing_detected": snap.breathing_detected,
+            "state_duration_seconds": int(snap.state_duration),
+            
+            # Session Summary
+            "session_duration_minutes": int(snap.session_duration / 60),
+            "session_duration_seconds": int(snap.session_duration),
             
-            # Sleep quality score (0-100)
-            sleep_quality = self._calculate_sleep_quality(session_duration)
+            # Sleep Duration Breakdown
+            "total_sleep_minutes": int(snap.total_sleep_seconds / 60),
+            "total_sleep_seconds": int(snap.total_sleep_seconds),
+            "deep_sleep_minutes": int(snap.deep_sleep_seconds / 60),
+            "deep_sleep_seconds": int(snap.deep_sleep_seconds),
+            "light_sleep_minutes": int(snap.light_sleep_seconds / 60),
+            "light_sleep_seconds": int(snap.light_sleep_seconds),
             
-            # Time in current state
-            state_duration = current_time - self.state_start_time if self.state_start_time > 0 else 0
+            # Sleep Quality
+            "sleep_quality_score": snap.sleep_quality,
+            "deep_sleep_percent": int((snap.deep_sleep_seconds / total_sleep) * 100),
+            "light_sleep_percent": int((snap.light_sleep_seconds / total_sleep) * 100),
             
-            # Breathing detected now
-            breathing_now = self.current_state in (SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP)
+            # Events
+            "wake_ups": snap.wake_ups,
+            "spasms": snap.spasms,
+            "sleep_cycles_completed": snap.sleep_cycles_completed,
             
-            return {
-                # Current State
-                "current_state": self.current_state.value,
-                "breathing_detected": breathing_now,
-                "state_duration_seconds": int(state_duration),
-                
-                # Session Summary
-                "session_duration_minutes": int(session_duration / 60),
-                "session_duration_seconds": int(session_duration),
-                
-                # Sleep Duration Breakdown
-                "total_sleep_minutes": int(self.total_sleep_seconds / 60),
-                "total_sleep_seconds": int(self.total_sleep_seconds),
-                "deep_sleep_minutes": int(self.deep_sleep_seconds / 60),
-                "deep_sleep_seconds": int(self.deep_sleep_seconds),
-                "light_sleep_minutes": int(self.light_sleep_seconds / 60),
-                "light_sleep_seconds": int(self.light_sleep_seconds),
-                
-                # Sleep Quality
-                "sleep_quality_score": sleep_quality,
-                "deep_sleep_percent": int((self.deep_sleep_seconds / max(self.total_sleep_seconds, 1)) * 100),
-                "light_sleep_percent": int((self.light_sleep_seconds / max(self.total_sleep_seconds, 1)) * 100),
-                
-                # Events
-                "wake_ups": self.wake_up_count,
-                "spasms": self.spasm_count,
-                "sleep_cycles_completed": len(self.sleep_cycles),
-                
-                # Breathing Analysis
-                "breathing_rate_bpm": breathing.get('breathing_rate_bpm', 0),
-                "breathing_variability": breathing.get('breathing_variability', 0),
-                "breathing_phase": breathing.get('sleep_phase', 'unknown'),
-                "breaths_detected": breathing.get('breath_count', 0),
-                
-                # Motion Analysis
-                "last_motion_score": float(analysis.get('current_score', 0)),
-                "motion_mean": float(analysis.get('mean', 0)),
-                "motion_std": float(analysis.get('std', 0)),
-                
-                # Misc
-                "events_count": len(self.events),
-                "pending_transition": self.pending_state.value if self.pending_state else None,
-            }
+            # Breathing Analysis
+            "breathing_rate_bpm": round(analysis.breathing_rate, 1),
+            "breathing_variability": round(analysis.breathing_variability, 3),
+            "breathing_phase": analysis.sleep_phase,
+            "breaths_detected": analysis.breath_count,
+            
+            # Motion Analysis
+            "last_motion_score": float(analysis.current_score),
+            "motion_mean": float(analysis.mean),
+            "motion_std": float(analysis.std),
+            
+            # Misc
+            "events_count": snap.events_count,
+            "pending_transition": snap.pending_transition,
+        }
     
     def _calculate_sleep_quality(self, session_duration: float) -> int:
         """
@@ -630,104 +997,78 @@ class SleepManager:
         - Wake-ups (fewer = better)
         - Breathing regularity (more regular = better during deep sleep)
         """
-        if session_duration < 60 or self.total_sleep_seconds < 60:
-            return 0  # Not enough data
-        
-        score = 100
-        
-        # Factor 1: Deep sleep ratio (target: 40-50% for babies)
-        deep_ratio = self.deep_sleep_seconds / max(self.total_sleep_seconds, 1)
-        if deep_ratio < 0.2:
-            score -= 20  # Too little deep sleep
-        elif deep_ratio < 0.35:
-            score -= 10
-        # Optimal is 0.35-0.50, no penalty
-        elif deep_ratio > 0.6:
-            score -= 5  # Too much deep sleep is unusual
-        
-        # Factor 2: Wake-ups (penalize fragmented sleep)
-        # Expected: ~1 wake-up per hour is normal
-        expected_wakes = session_duration / 3600
-        excess_wakes = max(0, self.wake_up_count - expected_wakes)
-        score -= min(30, int(excess_wakes * 10))  # -10 per extra wake-up, max -30
-        
-        # Factor 3: Spasms (normal but too many indicates restless sleep)
-        if self.spasm_count > 10:
-            score -= min(10, (self.spasm_count - 10))  # Penalize excessive spasms
-        
-        # Factor 4: Breathing regularity (during detected intervals)
-        breathing_stats = self.breathing_analyzer.get_stats()
-        variability = breathing_stats.get('breathing_variability', 0)
-        
-        # Very high variability might indicate restless sleep
-        if variability > 0.4:
-            score -= 10
-        
-        return max(0, min(100, score))
+        # Breathing regularity from the last update's analysis
+        analysis = self._last_analysis
+        variability = analysis.breathing_variability if analysis is not None else 0.0
+        return sleep_quality_score(float(session_duration), float(self.total_sleep_seconds),
+                                   float(self.deep_sleep_seconds), self.wake_up_count,
+                                   self.spasm_count, variability)
     
     def get_sleep_report(self) -> Dict[str, Any]:
         """
         Generate a comprehensive sleep report for parents.
+        The report is reused while the stats snapshot is; callers must not modify it.
         """
-        with self.lock:
-            stats = self.get_stats()
-            current_time = time.time()
+        # Only taking the snapshot needs the lock
+        snap = self._stats_snapshot()
+        cached = self._report_cache
+        if cached is not None and cached[0] is snap:
+            return cached[1]
+        stats = self._stats_dict(snap)
+        
+        # Format durations
+        total_mins = stats['total_sleep_minutes']
+        deep_mins = stats['deep_sleep_minutes']
+        light_mins = stats['light_sleep_minutes']
+        avg_cycle = snap.average_cycle_minutes
+        
+        # Breathing rate interpretation
+        bpm = snap.analysis.breathing_rate
+        breathing_status = "normal"
+        if bpm > 0:
+            if bpm < 25:
+                breathing_status = "slow"
+            elif bpm > 60:
+                breathing_status = "fast"
+        
+        report = {
+            "report_generated_at": time.time(),
             
-            # Format durations
-            total_mins = stats['total_sleep_minutes']
-            deep_mins = stats['deep_sleep_minutes']
-            light_mins = stats['light_sleep_minutes']
+            # Summary for parents
+            "summary": {
+                "total_sleep": f"{total_mins // 60}h {total_mins % 60}m",
+                "quality_score": snap.sleep_quality,
+                "quality_rating": self._get_quality_rating(snap.sleep_quality),
+            },
             
-            # Sleep cycle info
-            avg_cycle = 0
-            if self.sleep_cycles:
-                avg_cycle = sum(c['duration_minutes'] for c in self.sleep_cycles) / len(self.sleep_cycles)
+            # Detailed breakdown
+            "sleep_breakdown": {
+                "deep_sleep": f"{deep_mins}m ({stats['deep_sleep_percent']}%)",
+                "light_sleep": f"{light_mins}m ({stats['light_sleep_percent']}%)",
+                "description": self._get_breakdown_description(stats['deep_sleep_percent']),
+            },
             
-            # Breathing rate interpretation
-            bpm = stats['breathing_rate_bpm']
-            breathing_status = "normal"
-            if bpm > 0:
-                if bpm < 25:
-                    breathing_status = "slow"
-                elif bpm > 60:
-                    breathing_status = "fast"
+            # Events
+            "events_summary": {
+                "wake_ups": snap.wake_ups,
+                "spasms": snap.spasms,
+                "sleep_cycles": snap.sleep_cycles_completed,
+                "average_cycle_minutes": round(avg_cycle, 1) if avg_cycle > 0 else None,
+            },
             
-            return {
-                "report_generated_at": current_time,
-                
-                # Summary for parents
-                "summary": {
-                    "total_sleep": f"{total_mins // 60}h {total_mins % 60}m",
-                    "quality_score": stats['sleep_quality_score'],
-                    "quality_rating": self._get_quality_rating(stats['sleep_quality_score']),
-                },
-                
-                # Detailed breakdown
-                "sleep_breakdown": {
-                    "deep_sleep": f"{deep_mins}m ({stats['deep_sleep_percent']}%)",
-                    "light_sleep": f"{light_mins}m ({stats['light_sleep_percent']}%)",
-                    "description": self._get_breakdown_description(stats['deep_sleep_percent']),
-                },
-                
-                # Events
-                "events_summary": {
-                    "wake_ups": self.wake_up_count,
-                    "spasms": self.spasm_count,
-                    "sleep_cycles": len(self.sleep_cycles),
-                    "average_cycle_minutes": round(avg_cycle, 1) if avg_cycle > 0 else None,
-                },
-                
-                # Breathing
-                "breathing": {
-                    "average_rate_bpm": stats['breathing_rate_bpm'],
-                    "status": breathing_status,
-                    "variability": round(stats['breathing_variability'] * 100, 1),  # As percentage
-                    "current_phase": stats['breathing_phase'],
-                },
-                
-                # Raw stats for app
-                "raw_stats": stats,
-            }
+            # Breathing
+            "breathing": {
+                "average_rate_bpm": round(bpm, 1),
+                "status": breathing_status,
+                "variability": round(snap.analysis.breathing_variability * 100, 1),  # As percentage
+                "current_phase": snap.analysis.sleep_phase,
+            },
+            
+            # Raw stats for app
+            "raw_stats": stats,
+        }
+        self._report_cache = (snap, report)
+        return report
     
     def _get_quality_rating(self, score: int) -> str:
         """Convert score to human-readable rating."""
@@ -755,61 +1096,155 @@ class SleepManager:
     
     def get_recent_events(self, count: int = 10) -> List[Dict[str, Any]]:
         """Get the most recent sleep events."""
-        with self.lock:
-            recent = self.events[-count:] if len(self.events) > count else self.events
-            return [
-                {
-                    "type": e.event_type,
-                    "timestamp": e.timestamp,
-                    "data": e.data
-                }
-                for e in recent
-            ]
-    
-    def _save_to_history(self):
-        """Save the current session report to the history file."""
+        events, start_time, start_wall = self._events_view
+        return [
+            {
+                "type": e.event_type,
+                "timestamp": start_wall + (e.timestamp - start_time),
+                "data": e.data or {}
+            }
+            for e in events[max(len(events) - count, 0):]
+        ]
+    
+    def _save_to_history(self, report: Optional[Dict[str, Any]] = None):
+        """
+        Save the current session report to the history file.
+        The entry is built here; the file is written on a separate thread.
+        """
         try:
-            report = self.get_sleep_report()
+            if report is None:
+                report = self.get_sleep_report()
             
             # Create history entry with session metadata
             history_entry = {
                 "id": self.session_id,
-                "timestamp": self.session_start_time,
-                "date_iso": datetime.fromtimestamp(self.session_start_time).isoformat(),
+                "timestamp": self.session_start_wall,
+                "date_iso": datetime.fromtimestamp(self.session_start_wall).isoformat(),
                 "duration_seconds": int(self.total_sleep_seconds),
                 "duration_formatted": report['summary']['total_sleep'],
                 "quality_score": report['summary']['quality_score'],
                 "quality_rating": report['summary']['quality_rating'],
                 "report": report
             }
+        except Exception as e:
+            logger.error(f"Error saving to history: {e}")
+            return
+        
+        if self._history_index is not None:
+            # Copy on write: readers use the index without the lock
+            index = dict(self._history_index)
+            index[history_entry["id"]] = history_entry
+            while len(index) > self.HISTORY_LIMIT:
+                del index[next(iter(index))]
+            self._history_index = index
+        
+        # Not a daemon thread: an exiting app still finishes the write
+        self._history_writer = threading.Thread(
+            target=self._write_history, args=(history_entry, self._history_writer),
+            name="SleepHistoryWriter")
+        self._history_writer.start()
+    
+    def _write_history(self, history_entry: Dict[str, Any], previous: Optional[threading.Thread]):
+        """Append an entry to the history file, after the previous write finished."""
+        if previous is not None:
+            previous.join()
+        try:
+            with self._history_file_lock:
+                self._prepare_history_file()
+                
+                # One compact line per session: no need to read the file first
+                with open(self.HISTORY_FILE, 'a') as f:
+                    f.write(json.dumps(history_entry, separators=(',', ':')) + "\n")
+                self._history_lines += 1
+                
+                # Trim back to the last HISTORY_LIMIT entries once the file
+                # has grown HISTORY_COMPACT_EVERY past them
+                if self._history_lines >= self.HISTORY_LIMIT + self.HISTORY_COMPACT_EVERY:
+                    self._rewrite_history(self._tail_history_file())
             
-            # Load existing history
-            history = self._load_history()
-            
-            # Add new entry
-            history.append(history_entry)
-            
-            # Keep only last 100 entries
-            if len(history) > 100:
-                history = history[-100:]
-            
-            # Save back to file
-            with open(self.HISTORY_FILE, 'w') as f:
-                json.dump(history, f, indent=2)
-            
-            logger.info(f"Session {self.session_id} saved to history")
+            logger.info(f"Session {history_entry['id']} saved to history")
             
         except Exception as e:
             logger.error(f"Error saving to history: {e}")
     
-    def _load_history(self) -> List[Dict]:
-        """Load history from file."""
+    def _rewrite_history(self, history: List[Dict]):
+        """Replace the history file with the given entries."""
+        tmp_path = self.HISTORY_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in history:
+                f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        os.replace(tmp_path, self.HISTORY_FILE)
+        self._history_lines = len(history)
+    
+    def _prepare_history_file(self):
+        """
+        On first use, convert a legacy history file and trim the file to
+        HISTORY_LIMIT entries (caller holds _history_file_lock).
+        """
+        if self._history_lines is not None:
+            return
+        self._migrate_legacy_history()
+        if self._history_lines is not None:
+            return
+        if not os.path.exists(self.HISTORY_FILE):
+            self._history_lines = 0
+            return
+        with open(self.HISTORY_FILE, 'r') as f:
+            lines = sum(1 for _ in f)
+        if lines > self.HISTORY_LIMIT:
+            self._rewrite_history(self._tail_history_file())
+        else:
+            self._history_lines = lines
+    
+    def _tail_history_file(self) -> List[Dict]:
+        """The last HISTORY_LIMIT entries of the history file."""
         if not os.path.exists(self.HISTORY_FILE):
             return []
-        
-        try:
+        with open(self.HISTORY_FILE, 'r') as f:
+            lines = deque(f, maxlen=self.HISTORY_LIMIT)
+        return [json.loads(line) for line in lines if line.strip()]
+    
+    def _migrate_legacy_history(self):
+        """Convert a history saved as one JSON array to JSON Lines."""
+        legacy = None
+        if os.path.exists(self.HISTORY_FILE):
             with open(self.HISTORY_FILE, 'r') as f:
-                return json.load(f)
+                if f.read(1) == '[':
+                    f.seek(0)
+                    legacy = json.load(f)
+        elif os.path.exists(self.LEGACY_HISTORY_FILE):
+            with open(self.LEGACY_HISTORY_FILE, 'r') as f:
+                legacy = json.load(f)
+        if legacy is not None:
+            self._rewrite_history(legacy[-self.HISTORY_LIMIT:])
+            logger.info(f"History converted to {self.HISTORY_FILE}")
+    
+    def _load_history(self) -> List[Dict]:
+        """Load history from file (once pending writes have finished)."""
+        writer = self._history_writer
+        if writer is not None:
+            writer.join()
+        return self._read_history_file()
+    
+    def _get_history_index(self) -> Dict[str, Dict]:
+        """
+        The saved sessions by id, loading them on first use.
+        The returned dict is never modified; saving replaces it.
+        """
+        index = self._history_index
+        if index is None:
+            with self.lock:
+                if self._history_index is None:
+                    self._history_index = {entry.get("id"): entry for entry in self._load_history()}
+                index = self._history_index
+        return index
+    
+    def _read_history_file(self) -> List[Dict]:
+        """Read the last HISTORY_LIMIT entries of the history file."""
+        try:
+            with self._history_file_lock:
+                self._prepare_history_file()
+                return self._tail_history_file()
         except (json.JSONDecodeError, IOError) as e:
             logger.error(f"Error loading history: {e}")
             return []
@@ -819,37 +1254,30 @@ class SleepManager:
         Get list of past sleep sessions (summary only).
         Returns most recent sessions first.
         """
-        with self.lock:
-            history = self._load_history()
-            
-            # Return most recent first, with summary data only
-            summaries = []
-            for entry in reversed(history[-limit:]):
-                summaries.append({
-                    "id": entry.get("id"),
-                    "timestamp": entry.get("timestamp"),
-                    "date_iso": entry.get("date_iso"),
-                    "duration_seconds": entry.get("duration_seconds"),
-                    "duration_formatted": entry.get("duration_formatted"),
-                    "quality_score": entry.get("quality_score"),
-                    "quality_rating": entry.get("quality_rating"),
-                })
-            
-            return summaries
+        history = list(self._get_history_index().values())
+        
+        # Return most recent first, with summary data only
+        summaries = []
+        for entry in reversed(history[-limit:]):
+            summaries.append({
+                "id": entry.get("id"),
+                "timestamp": entry.get("timestamp"),
+                "date_iso": entry.get("date_iso"),
+                "duration_seconds": entry.get("duration_seconds"),
+                "duration_formatted": entry.get("duration_formatted"),
+                "quality_score": entry.get("quality_score"),
+                "quality_rating": entry.get("quality_rating"),
+            })
+        
+        return summaries
     
     def get_session_report(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Get the full report for a specific session by ID.
         Returns None if session not found.
         """
-        with self.lock:
-            history = self._load_history()
-            
-            for entry in history:
-                if entry.get("id") == session_id:
-                    return entry.get("report")
-            
-            return None
+        entry = self._get_history_index().get(session_id)
+        return entry.get("report") if entry is not None else None
     
     def set_thresholds(self, **kwargs):
         """Update detection thresholds."""
@@ -858,6 +1286,8 @@ class SleepManager:
                 if hasattr(self, key.upper()) and value is not None:
                     setattr(self, key.upper(), value)
                     logger.info(f"Threshold updated: {key}={value}")
+            self._recount_window()
+            self._build_confirmation_times()
 
 
 # Global singleton instance
@@ -870,5 +1300,6 @@ def get_sleep_manager() -> SleepManager:
     global _sleep_manager
     with _sleep_manager_lock:
         if _sleep_manager is None:
+            _start_logging()
             _sleep_manager = SleepManager()
         return _sleep_manager
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import sleep_manager
+from sleep_manager import SleepManager
+
+
+class HistoryTest(unittest.TestCase):
+    """Session history file: JSON Lines storage, trimming and migration."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.history_file = os.path.join(self.tmp.name, "sleep_history.jsonl")
+        self.legacy_file = os.path.join(self.tmp.name, "sleep_history.json")
+
+    def make_manager(self, limit=5, compact_every=2):
+        manager = SleepManager()
+        manager.HISTORY_FILE = self.history_file
+        manager.LEGACY_HISTORY_FILE = self.legacy_file
+        manager.HISTORY_LIMIT = limit
+        manager.HISTORY_COMPACT_EVERY = compact_every
+        return manager
+
+    def save_sessions(self, manager, count):
+        """Record count sessions long enough to be saved; returns their ids."""
+        ids = []
+        for _ in range(count):
+            manager.start_session()
+            manager.total_sleep_seconds = 120
+            ids.append(manager.session_id)
+            manager.stop_session()
+        manager._history_writer.join()
+        return ids
+
+    def file_lines(self):
+        with open(self.history_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_file_stays_bounded_across_restarts(self):
+        ids = []
+        # Fewer saves per run than HISTORY_COMPACT_EVERY + HISTORY_LIMIT
+        for _ in range(6):
+            ids += self.save_sessions(self.make_manager(), 3)
+            self.assertLessEqual(len(self.file_lines()), 5 + 2)
+
+        history = self.make_manager().get_history(limit=50)
+        self.assertEqual([h["id"] for h in history], ids[::-1][:5])
+
+    def test_oversized_file_is_trimmed_on_first_use(self):
+        with open(self.history_file, "w") as f:
+            for k in range(20):
+                f.write(json.dumps({"id": str(k)}) + "\n")
+
+        history = self.make_manager().get_history(limit=50)
+        self.assertEqual([h["id"] for h in history], ["19", "18", "17", "16", "15"])
+        self.assertEqual([e["id"] for e in self.file_lines()], ["15", "16", "17", "18", "19"])
+
+    def test_legacy_json_array_is_migrated(self):
+        with open(self.legacy_file, "w") as f:
+            json.dump([{"id": str(k), "report": {"k": k}} for k in range(8)], f)
+
+        manager = self.make_manager()
+        self.assertEqual([h["id"] for h in manager.get_history()], ["7", "6", "5", "4", "3"])
+        self.assertEqual(manager.get_session_report("7"), {"k": 7})
+        self.assertIsNone(manager.get_session_report("2"))
+        self.assertEqual(len(self.file_lines()), 5)
+
+        # A new session is appended after the migrated ones
+        new_id = self.save_sessions(manager, 1)[0]
+        self.assertEqual(self.file_lines()[-1]["id"], new_id)
+
+    def test_array_in_history_file_is_migrated(self):
+        with open(self.history_file, "w") as f:
+            json.dump([{"id": "a"}, {"id": "b"}], f)
+
+        self.assertEqual([h["id"] for h in self.make_manager().get_history()], ["b", "a"])
+        self.assertEqual(self.file_lines(), [{"id": "a"}, {"id": "b"}])
+
+    def test_index_keeps_last_sessions(self):
+        manager = self.make_manager()
+        first = self.save_sessions(manager, 2)
+        index = manager._get_history_index()
+        later = self.save_sessions(manager, 5)
+
+        # Saving replaces the index rather than changing it under readers
+        self.assertEqual(list(index), first)
+        self.assertEqual([h["id"] for h in manager.get_history()], later[::-1])
+        self.assertIsNone(manager.get_session_report(first[0]))
+        self.assertIsNotNone(manager.get_session_report(later[0]))
+
+    def test_stop_session_saves_the_report_already_built(self):
+        manager = self.make_manager()
+        # Stopped clock: the report stays current until the session stops
+        with mock.patch.object(sleep_manager.time, "monotonic", return_value=1000.0):
+            manager.start_session()
+            manager.update(3e4)
+            manager.total_sleep_seconds = 120
+            manager._stats_cache = None
+            report = manager.get_sleep_report()
+            with mock.patch.object(manager, "get_sleep_report", side_effect=AssertionError):
+                manager.stop_session()
+        manager._history_writer.join()
+        self.assertEqual(self.file_lines()[-1]["report"], json.loads(json.dumps(report)))
+
+    def test_report_errors_are_logged(self):
+        manager = self.make_manager()
+        manager.start_session()
+        manager.total_sleep_seconds = 120
+        with mock.patch.object(manager, "get_sleep_report", side_effect=KeyError("summary")), \
+                self.assertLogs("SleepManager", "ERROR"):
+            manager.stop_session()
+        self.assertIsNone(manager._history_writer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from sleep_manager import MotionBuffer
+
+
+class MotionBufferTest(unittest.TestCase):
+    """MotionBuffer against a plain list of (timestamp, score) samples."""
+
+    def check(self, buf, samples, appended):
+        self.assertEqual(len(buf), len(samples))
+        live = slice(buf.start, buf.end)
+        np.testing.assert_array_equal(buf.timestamps[live], [t for t, _ in samples])
+        np.testing.assert_array_equal(buf.scores[live], [s for _, s in samples])
+        # base + array position is the sample's index in append order
+        self.assertEqual(buf.base + buf.end, appended)
+        self.assertEqual(buf.last_score(), samples[-1][1] if samples else 0.0)
+
+    def test_random_appends_and_drops(self):
+        rnd = np.random.default_rng(3)
+        buf = MotionBuffer(capacity=8)
+        samples = []
+        most_live = 0
+        t = 0.0
+        for appended in range(1, 5001):
+            # Mostly steady ticks, some repeated timestamps and some gaps
+            t += rnd.choice([0.0, 0.2, 0.2, 0.2, 7.0])
+            score = float(rnd.uniform(0, 1e7))
+            buf.append(t, score)
+            samples.append((t, score))
+
+            cutoff = t - rnd.choice([3.0, 60.0])
+            buf.drop_before(cutoff)
+            samples = [(ts, s) for ts, s in samples if ts >= cutoff]
+            self.check(buf, samples, appended)
+            most_live = max(most_live, len(samples))
+
+            since = t - rnd.uniform(0, 10)
+            np.testing.assert_array_equal(buf.scores_since(since),
+                                          [s for ts, s in samples if ts >= since])
+
+        # Arrays only grow when compacting would leave them over half full
+        self.assertLessEqual(len(buf.timestamps), 4 * most_live)
+
+    def test_clear(self):
+        buf = MotionBuffer(capacity=4)
+        for k in range(10):
+            buf.append(float(k), float(k))
+        buf.drop_before(6.0)
+        buf.clear()
+        self.check(buf, [], 10)
+        self.assertEqual(len(buf.scores_since(0.0)), 0)
+        buf.append(20.0, 5.0)
+        self.check(buf, [(20.0, 5.0)], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
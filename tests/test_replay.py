@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import sleep_manager
+from sleep_manager import SleepManager, SleepState
+
+
+def recorded_trace():
+    """Ten minutes at 5 Hz: regular breathing with a minute of waking at 400 s."""
+    rnd = np.random.default_rng(7)
+    timestamps = np.arange(3000) * 0.2
+    scores = rnd.uniform(2e4, 4e4, 3000)
+    scores[::15] = 6e4                                # A breath every 3 s
+    scores[2000:2300] = rnd.uniform(6e6, 2e7, 300)    # Awake
+    return scores, timestamps
+
+
+class ReplayTest(unittest.TestCase):
+    """update_many() replays a recorded trace on the recording's clock."""
+
+    def setUp(self):
+        self.scores, self.timestamps = recorded_trace()
+        self.manager = SleepManager()
+        self.states = self.manager.update_many(self.scores, self.timestamps)
+
+    def test_matches_live_updates(self):
+        live = SleepManager()
+        with mock.patch.object(sleep_manager.time, "monotonic", side_effect=self.timestamps.tolist()):
+            states = [live.update(score) for score in self.scores]
+        self.assertEqual(self.states, states)
+        self.assertEqual(self.manager.total_sleep_seconds, live.total_sleep_seconds)
+        self.assertEqual(self.manager.spasm_count, live.spasm_count)
+
+    def test_states(self):
+        self.assertEqual(len(self.states), len(self.scores))
+        changes = [(self.timestamps[i], state) for i, state in enumerate(self.states)
+                   if i == 0 or state != self.states[i - 1]]
+        self.assertEqual([state for _, state in changes],
+                         [SleepState.UNKNOWN, SleepState.LIGHT_SLEEP, SleepState.SPASM,
+                          SleepState.AWAKE, SleepState.LIGHT_SLEEP])
+        # Waking is picked up within seconds of the movement starting at 400 s
+        self.assertTrue(400 <= changes[2][0] < 405)
+
+    def test_durations_follow_the_recording(self):
+        stats = self.manager.get_stats()
+        self.assertEqual(stats["session_duration_seconds"], 599)
+        last_change = max(i for i in range(1, len(self.states)) if self.states[i] != self.states[i - 1])
+        self.assertEqual(stats["state_duration_seconds"],
+                         int(self.timestamps[-1] - self.timestamps[last_change]))
+
+        # Each interval counts toward sleep when the state it ends in is asleep
+        asleep = np.array([s in (SleepState.DEEP_SLEEP, SleepState.LIGHT_SLEEP, SleepState.SPASM)
+                           for s in self.states])
+        expected = np.diff(self.timestamps)[asleep[1:]].sum()
+        self.assertAlmostEqual(self.manager.total_sleep_seconds, expected)
+
+        # Stopping adds the sleep up to the last replayed sample, not up to now
+        with tempfile.TemporaryDirectory() as tmp:
+            self.manager.HISTORY_FILE = os.path.join(tmp, "sleep_history.jsonl")
+            self.manager.stop_session()
+            self.manager._history_writer.join()
+        self.assertAlmostEqual(self.manager.total_sleep_seconds, expected)
+
+    def test_event_times_are_replayed_timestamps(self):
+        events = self.manager.get_recent_events()
+        self.assertEqual([e["type"] for e in events], ["fell_asleep", "spasm", "fell_asleep"])
+        first_sleep = self.states.index(SleepState.LIGHT_SLEEP)
+        self.assertAlmostEqual(events[0]["timestamp"], self.timestamps[first_sleep])
+
+    def test_replay_continues_in_batches(self):
+        manager = SleepManager()
+        states = manager.update_many(self.scores[:1234], self.timestamps[:1234])
+        states += manager.update_many(self.scores[1234:], self.timestamps[1234:])
+        self.assertEqual(states, self.states)
+
+    def test_replay_and_live_samples_do_not_mix(self):
+        with self.assertRaises(ValueError):
+            self.manager.update(3e4)
+        with self.assertRaises(ValueError):
+            self.manager.update_many(self.scores[:5], self.timestamps[:5])
+
+        live = SleepManager()
+        live.update(3e4)
+        with self.assertRaises(ValueError):
+            live.update_many(self.scores, self.timestamps)
+
+        # A new session can be replayed into
+        live.start_session()
+        self.assertEqual(live.update_many(self.scores, self.timestamps), self.states)
+
+    def test_rejects_bad_input(self):
+        manager = SleepManager()
+        with self.assertRaises(ValueError):
+            manager.update_many(self.scores[:10], self.timestamps[:9])
+        with self.assertRaises(ValueError):
+            manager.update_many(self.scores[:10], self.timestamps[:10][::-1])
+        self.assertEqual(manager.update_many([], []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from sleep_manager import SleepManager
+
+
+class SleepQualityTest(unittest.TestCase):
+    """Quality score and the breathing figures it is computed from."""
+
+    def setUp(self):
+        self.manager = SleepManager()
+        self.manager.total_sleep_seconds = 3600
+        self.manager.deep_sleep_seconds = 1500
+
+    def quality(self, variability):
+        analysis = self.manager._last_analysis
+        self.manager._last_analysis = analysis._replace(breathing_variability=variability)
+        return self.manager._calculate_sleep_quality(3600)
+
+    def test_variability_penalty_uses_unrounded_value(self):
+        # An analysis from a real update, so only the variability is made up
+        self.manager.update_many(np.full(10, 3e4), np.arange(10) * 0.2)
+        self.assertEqual(self.quality(0.4) - self.quality(0.4003), 10)
+
+    def test_breathing_figures_rounded_only_for_output(self):
+        rnd = np.random.default_rng(4)
+        timestamps = np.cumsum(rnd.uniform(0.15, 0.25, 1500))
+        scores = np.where(rnd.random(1500) < 0.08, 6e4, 3e4)
+        self.manager.update_many(scores, timestamps)
+
+        breathing = self.manager.breathing_analyzer
+        analysis = self.manager._last_analysis
+        self.assertEqual(analysis.breathing_variability, breathing.get_breathing_variability())
+        self.assertEqual(analysis.breathing_rate, breathing.get_breathing_rate())
+
+        stats = self.manager.get_stats()
+        self.assertEqual(stats["breathing_variability"], round(analysis.breathing_variability, 3))
+        self.assertEqual(stats["breathing_rate_bpm"], round(analysis.breathing_rate, 1))
+        report = self.manager.get_sleep_report()
+        self.assertEqual(report["breathing"]["average_rate_bpm"], stats["breathing_rate_bpm"])
+
+
+if __name__ == "__main__":
+    unittest.main()
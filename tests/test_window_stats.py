@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from sleep_manager import SleepManager
+
+
+class RollingWindowTest(unittest.TestCase):
+    """The running window stats of update() against NumPy over the same window."""
+
+    def test_matches_numpy_over_long_trace(self):
+        rnd = np.random.default_rng(11)
+        n = 20000
+        timestamps = np.cumsum(rnd.choice([0.0, 0.1, 0.2, 0.2, 0.3, 15.0], n))
+        # Quiet breathing with bursts of movement and stretches of silence,
+        # so values many orders of magnitude apart enter and leave the window
+        scores = rnd.uniform(2e4, 4e4, n)
+        bursts = rnd.random(n) < 0.05
+        scores[bursts] = rnd.uniform(1e6, 3e7, bursts.sum())
+        scores[rnd.random(n) < 0.05] = 0.0
+
+        manager = SleepManager()
+        for i in range(n):
+            if i == n // 2:
+                # Changing the threshold recounts the window
+                manager.set_thresholds(movement_threshold=2e6)
+            t = timestamps[i]
+            manager.update_many(scores[i:i + 1], timestamps[i:i + 1])
+            analysis = manager._last_analysis
+
+            window = scores[:i + 1][timestamps[:i + 1] >= t - manager.ANALYSIS_WINDOW]
+            spasm = scores[:i + 1][timestamps[:i + 1] >= t - manager.SPASM_WINDOW]
+            self.assertEqual(analysis.sample_count, len(window))
+            self.assertAlmostEqual(analysis.mean, window.mean(), delta=1e-9 * window.max() + 1e-9)
+            std = window.std(ddof=1) if len(window) > 1 else 0.0
+            self.assertAlmostEqual(analysis.std, std, delta=1e-6 * window.max() + 1e-6)
+            self.assertEqual(analysis.high_movement_ratio,
+                             np.count_nonzero(window > manager.MOVEMENT_THRESHOLD) / len(window))
+            self.assertEqual(analysis.spasm_max, spasm.max())
+
+    def test_fresh_analysis_matches_running_stats(self):
+        rnd = np.random.default_rng(5)
+        timestamps = np.arange(500) * 0.3  # No sample on the window edge
+        scores = rnd.uniform(1e4, 1e7, 500)
+        manager = SleepManager()
+        manager.update_many(scores, timestamps)
+
+        # Away from the last update's time the window is computed afresh
+        running = manager._analyze_buffer(timestamps[-1])
+        fresh = manager._analyze_buffer(timestamps[-1] + 1e-9)
+        self.assertEqual(running.sample_count, fresh.sample_count)
+        self.assertAlmostEqual(running.mean, fresh.mean, delta=1e-6)
+        self.assertAlmostEqual(running.std, fresh.std, delta=1e-6)
+        self.assertEqual(running.high_movement_ratio, fresh.high_movement_ratio)
+        self.assertEqual(running.spasm_max, fresh.spasm_max)
+
+
+class ThrottleTest(unittest.TestCase):
+    """MIN_UPDATE_INTERVAL skips state evaluations but keeps every sample."""
+
+    def test_samples_kept_between_evaluations(self):
+        rnd = np.random.default_rng(2)
+        timestamps = np.arange(600) * 0.2
+        scores = rnd.uniform(2e4, 4e4, 600)
+        scores[300:400] = rnd.uniform(6e6, 2e7, 100)
+
+        manager = SleepManager()
+        manager.MIN_UPDATE_INTERVAL = 1.0
+        evaluated = []
+        for i in range(600):
+            before = manager._last_update_time
+            manager.update_many(scores[i:i + 1], timestamps[i:i + 1])
+            if manager._last_update_time != before:
+                evaluated.append(timestamps[i])
+
+        gaps = np.diff(evaluated)
+        self.assertTrue(np.all(gaps >= 1.0))
+        self.assertLess(gaps.max(), 1.0 + 0.2 + 1e-9)
+
+        # All samples are buffered and analyzed, evaluated or not
+        end = timestamps[-1]
+        self.assertEqual(len(manager.motion_buffer),
+                         np.count_nonzero(timestamps >= end - manager.BUFFER_DURATION))
+        self.assertEqual(manager._last_analysis.sample_count,
+                         np.count_nonzero(timestamps >= evaluated[-1] - manager.ANALYSIS_WINDOW)
+                         - np.count_nonzero(timestamps > evaluated[-1]))
+
+        # Sleep time only advances at evaluations, but covers the whole span
+        unthrottled = SleepManager()
+        unthrottled.update_many(scores, timestamps)
+        self.assertAlmostEqual(manager.total_sleep_seconds, unthrottled.total_sleep_seconds,
+                               delta=5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()